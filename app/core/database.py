@@ -1,17 +1,38 @@
-import time
+"""
+Database engine, session factory and connection helpers.
+
+Sessions are created with expire_on_commit=False: objects keep their loaded
+state after commit instead of re-SELECTing on the next attribute access.
+Code that needs server-generated or concurrently changed values after a
+commit must call db.refresh(obj) explicitly.
+"""
 import sqlalchemy.exc
-from sqlalchemy import create_engine, text
+from typing import Optional
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from ..core.config import settings
+from sqlalchemy.orm import raiseload, sessionmaker
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from ..core.config import get_settings
 from ..core.logging import logger
 
+settings = get_settings()
+
+# Liveness probe statement, built once instead of on every health check
+_PING = text("SELECT 1")
+
 # Create engine with better error handling
 try:
     engine = create_engine(
         settings.DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
         pool_pre_ping=True,  # Detect disconnections
-        pool_recycle=3600,   # Recycle connections after 1 hour
+        pool_recycle=settings.DB_POOL_RECYCLE,  # Recycle connections (default 30 minutes)
+        pool_use_lifo=True,  # Reuse the most recently returned (warm) connection first
+        # Sessions always end with an explicit commit/rollback on close, so skip the
+        # extra ROLLBACK round-trip the pool would otherwise issue on every checkin
+        pool_reset_on_return=None,
         connect_args=settings.DB_CONNECT_ARGS  # Get SSL settings from config
     )
     logger.info("Database engine created successfully")
@@ -25,53 +46,70 @@ except Exception as e:
         logger.error("Could not create database engine, application may not function correctly")
         raise
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+if settings.STRICT_LOADING:
+    @event.listens_for(SessionLocal, "do_orm_execute")
+    def _raise_on_lazy_load(orm_execute_state):
+        """
+        Attach raiseload("*") to every top-level ORM SELECT so any relationship
+        that wasn't explicitly eager-loaded raises instead of issuing an N+1 query.
+        Explicit loader options (joinedload etc.) still take precedence.
+        """
+        if (
+            orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+        ):
+            statement = orm_execute_state.statement
+            if isinstance(statement, StatementLambdaElement):
+                orm_execute_state.statement = statement.add_criteria(lambda s: s.options(raiseload("*")))
+            else:
+                orm_execute_state.statement = statement.options(raiseload("*"))
+    
+    logger.warning("STRICT_LOADING is on: lazy relationship loads will raise")
 
 Base = declarative_base()
 
 def get_db():
     """
     Dependency function to get a database session.
-    Implements retries for transient database errors.
+    Stale connections are handled by pool_pre_ping on checkout, so no probe query is needed here.
+
+    Sessions are synchronous: endpoints that use them should be plain `def` so FastAPI
+    runs them in its threadpool instead of blocking the event loop.
     """
-    db = None
-    retry_count = 0
-    max_retries = 3
-    retry_delay = 1  # seconds
-    
-    while retry_count < max_retries:
-        try:
-            db = SessionLocal()
-            # Test connection
-            db.execute(sqlalchemy.text("SELECT 1"))
-            yield db
-            break
-        except sqlalchemy.exc.OperationalError as e:
-            retry_count += 1
-            logger.warning(f"Database connection error (attempt {retry_count}/{max_retries}): {str(e)}")
-            if db:
-                db.close()
-            
-            if retry_count >= max_retries:
-                logger.error(f"Maximum retry attempts reached. Database connection failed: {str(e)}")
-                raise
-            
-            # Wait before retrying
-            time.sleep(retry_delay)
-        except Exception as e:
-            logger.error(f"Unexpected database error: {str(e)}")
-            if db:
-                db.close()
-            raise
-        finally:
-            if db:
-                db.close()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def warm_connection_pool(n: Optional[int] = None) -> None:
+    """
+    Open `n` pooled connections up front so the first requests after boot
+    don't each pay the connect/TLS/auth handshake.
+    """
+    n = n or settings.DB_POOL_WARM_SIZE
+    conns = []
+    try:
+        for _ in range(n):
+            conns.append(engine.connect())
+        for conn in conns:
+            conn.execute(_PING)
+        logger.info(f"Warmed {len(conns)} database connections")
+    except Exception as e:
+        logger.warning(f"Connection pool warm-up stopped early: {str(e)}")
+    finally:
+        # Closing returns the connections to the pool, now warm
+        for conn in conns:
+            conn.close()
 
 def test_db_connection():
     """Test database connection and report any issues"""
     try:
         with engine.connect() as conn:
-            result = conn.execute(sqlalchemy.text("SELECT 1"))
+            result = conn.execute(_PING)
             conn.commit()
             result.fetchone()
         return True, "Database connection successful"
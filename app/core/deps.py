@@ -0,0 +1,68 @@
+from typing import NamedTuple, Optional
+from uuid import UUID
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import Session
+from .database import get_db
+from ..models.user import User
+from ..utils.cache import TTLCache
+
+class RequestingUser(NamedTuple):
+    id: UUID
+    email: str
+    username: str
+    is_admin: bool
+
+# Requester snapshots keyed by user id. The cache is per process: invalidate_requesting_user
+# only clears the local copy, so other workers/instances keep a stale entry (including
+# is_admin, or a deleted user) until it expires. The TTL is kept short, like jwt_cache,
+# to bound that window
+REQUESTING_USER_CACHE_TTL_SECONDS = 5
+
+_requesting_user_cache = TTLCache(maxsize=10000, ttl=REQUESTING_USER_CACHE_TTL_SECONDS)
+
+def get_requesting_user(
+    requesting_user_id: UUID,
+    db: Session = Depends(get_db)
+) -> RequestingUser:
+    """
+    Resolve the user making the request (from the `requesting_user_id` query parameter).
+    Served from a short-lived cache; FastAPI also caches the dependency per request.
+    """
+    user = _requesting_user_cache.get(requesting_user_id)
+    if user is not None:
+        return user
+    
+    row = db.execute(lambda_stmt(
+        lambda: select(User.id, User.email, User.username, User.is_admin)
+        .where(User.id == requesting_user_id)
+    )).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Requesting user not found"
+        )
+    
+    user = RequestingUser(*row)
+    _requesting_user_cache.set(requesting_user_id, user)
+    return user
+
+def require_admin(
+    requesting_user: RequestingUser = Depends(get_requesting_user)
+) -> RequestingUser:
+    """Same as get_requesting_user, but rejects non-admin users with 403."""
+    if not requesting_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions. Admin access required"
+        )
+    return requesting_user
+
+def invalidate_requesting_user(*user_ids: Optional[UUID]) -> None:
+    """
+    Drop cached requester snapshots after the user is updated or deleted.
+    Only affects this process; other instances catch up when their entries expire.
+    """
+    for user_id in user_ids:
+        if user_id:
+            _requesting_user_cache.pop(user_id)
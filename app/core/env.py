@@ -0,0 +1,27 @@
+import functools
+import os
+import types
+from typing import Mapping, Optional
+from dotenv import load_dotenv
+
+@functools.cache
+def ensure_dotenv_loaded() -> None:
+    """
+    Load the .env file into os.environ exactly once per process.
+    Variables already present in the environment are never overridden.
+    """
+    load_dotenv(override=False)
+
+ensure_dotenv_loaded()
+
+# Read-only snapshot of the environment taken after .env has been merged
+_ENV: Mapping[str, str] = types.MappingProxyType(dict(os.environ))
+
+def getenv(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a variable from the cached environment snapshot."""
+    return _ENV.get(key, default)
+
+def refresh_env_cache() -> None:
+    """Re-snapshot os.environ, e.g. after a test has patched variables."""
+    global _ENV
+    _ENV = types.MappingProxyType(dict(os.environ))
@@ -0,0 +1,27 @@
+import hashlib
+import time
+from typing import Any, Dict
+from jose import jwt
+from .config import settings
+from ..utils.cache import TTLCache
+
+# Short TTL keeps the window in which a revoked/rotated key is still honoured small
+JWT_CACHE_TTL_SECONDS = 5
+
+_decoded_tokens = TTLCache(maxsize=10_000, ttl=JWT_CACHE_TTL_SECONDS)
+
+def decode_cached(token: str) -> Dict[str, Any]:
+    """
+    Decode and verify a JWT, reusing the result for repeated calls with the same token.
+    Raises jose.JWTError exactly like jwt.decode; failures are never cached.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _decoded_tokens.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    # Never keep an entry past the token's own expiry
+    remaining = payload.get("exp", 0) - time.time()
+    _decoded_tokens.set(key, payload, ttl=min(JWT_CACHE_TTL_SECONDS, max(remaining, 0)))
+    return payload
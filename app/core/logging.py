@@ -1,8 +1,10 @@
+import atexit
 import logging
+import queue
 import sys
 from pathlib import Path
 import os
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Create logs directory if it doesn't exist
 logs_dir = Path("logs")
@@ -11,22 +13,34 @@ logs_dir.mkdir(exist_ok=True)
 # Configure logging
 def setup_logging():
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()  # Get log level from environment variable
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            RotatingFileHandler(
-                os.path.join("logs", "app.log"),
-                maxBytes=5 * 1024 * 1024,  # 5 MB
-                backupCount=5  # Keep 5 backup files
-            )
-        ]
-    )
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    handlers = [
+        logging.StreamHandler(sys.stdout),
+        RotatingFileHandler(
+            os.path.join("logs", "app.log"),
+            maxBytes=5 * 1024 * 1024,  # 5 MB
+            backupCount=5  # Keep 5 backup files
+        )
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
     
-    # Setup specific loggers
+    # Callers (including the event loop) only enqueue records; a background thread
+    # does the formatting and the stdout/file writes
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Flush whatever is still queued on exit
+    
+    # Added directly rather than through basicConfig, which would give the QueueHandler its own
+    # formatter and format every record twice
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_logger.addHandler(QueueHandler(log_queue))
+    
+    # Setup specific loggers; LOG_LEVEL applies here too so disabled levels are skipped early
     logger = logging.getLogger("himalai")  # Changed from "tripo" to "himalai"
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(log_level)
     
     return logger
 
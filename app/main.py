@@ -1,21 +1,17 @@
 import os
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
 import sqlalchemy.exc
 
-# 1. FIRST load environment variables before anything else
-from dotenv import load_dotenv
-load_dotenv()
-
-# Now import everything else
+# 1. Environment variables are loaded once by get_settings() when config is imported
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import settings
+from fastapi.responses import ORJSONResponse
+from app.core.config import get_settings
+from app.core.env import getenv
 from app.core.logging import logger
-from app.core.database import Base, engine, test_db_connection
-
-# Import routers
-from app.routes import health, auth, transaction, file_upload
-from app.routes.user_detail import router as user_detail_router
-from app.routes.voucher_router import router as voucher_router
+from app.core.database import Base, engine, test_db_connection, warm_connection_pool
 
 
 # 2. Validate critical configurations immediately
@@ -28,7 +24,7 @@ def validate_config():
     
     missing = []
     for var, desc in required_vars.items():
-        if not os.getenv(var, "").strip():  # Check for empty/whitespace values
+        if not (getenv(var) or "").strip():  # Check for empty/whitespace values
             missing.append(f"{desc} ({var})")
     
     if missing:
@@ -38,34 +34,92 @@ def validate_config():
 
 validate_config()
 
+settings = get_settings()
+
+# Startup/shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Starting {settings.APP_NAME} (Environment: {settings.ENVIRONMENT})")
+    logger.debug(f"Allowed origins: {settings.ALLOWED_ORIGINS}")
+    logger.debug(f"Groq model: {settings.GROQ_MODEL}")
+    
+    # Both steps are blocking DB calls, so run them side by side in worker threads
+    _, (success, message) = await asyncio.gather(
+        asyncio.to_thread(warm_connection_pool),
+        asyncio.to_thread(test_db_connection),
+    )
+    if success:
+        logger.info("Database connection successful")
+    else:
+        logger.error(f"Database connection failed: {message}")
+    
+    yield
+    
+    logger.info("Shutting down application")
+    # Release the pooled Groq connections
+    from app.services.groq_service import close_groq_session
+    await close_groq_session()
+
 # 3. Now initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description="Himalai Expense Analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson encodes UUID/datetime natively, which every model response carries
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
-origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
-origins = [origin.strip() for origin in origins if origin.strip()]  # Clean empty values
-
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,
+    allow_origins=list(settings.ALLOWED_ORIGINS),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser frontend read the keyset cursor of paginated listings
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Include all routers
+def register_routers(app: FastAPI) -> None:
+    """
+    Import and mount the API routers.
+    The file upload router pulls in the PDF/Excel parsers, so it is only imported when enabled.
+    """
+    from app.routes import health, auth, transaction
+    from app.routes.user_detail import router as user_detail_router
+    from app.routes.voucher_router import router as voucher_router
+
+    app.include_router(auth.router, prefix=settings.API_V1_STR)
+    app.include_router(health.router, prefix=settings.API_V1_STR)
+    app.include_router(transaction.router, prefix=settings.API_V1_STR)
+    if settings.ENABLE_FILE_UPLOAD:
+        file_upload = importlib.import_module("app.routes.file_upload")
+        app.include_router(file_upload.router, prefix=settings.API_V1_STR)
+    app.include_router(
+        user_detail_router,
+        prefix="/api/users",
+        tags=["Users"]
+    )
+    app.include_router(voucher_router, prefix="/api/vouchers", tags=["Vouchers"])
+
+# Routers also register the models, so this must run before create_all
+register_routers(app)
+
 # Database initialization with better error handling
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except sqlalchemy.exc.OperationalError as e:
-    logger.error(f"Database connection failed: {str(e)}")
-    logger.error("Please check your DATABASE_URL in .env")
-except Exception as e:
-    logger.error(f"Unexpected database error: {str(e)}")
+# Production schemas are managed out of band; set SCHEMA_INIT_ON_STARTUP=true to opt in
+if settings.SCHEMA_INIT_ON_STARTUP:
+    try:
+        Base.metadata.create_all(bind=engine)
+        logger.info("Database tables created successfully")
+    except sqlalchemy.exc.OperationalError as e:
+        logger.error(f"Database connection failed: {str(e)}")
+        logger.error("Please check your DATABASE_URL in .env")
+    except Exception as e:
+        logger.error(f"Unexpected database error: {str(e)}")
+else:
+    logger.info("Skipping schema initialization (SCHEMA_INIT_ON_STARTUP is off)")
 
 # Route
 @app.get("/")
@@ -73,40 +127,10 @@ async def root():
     return {"message": "Welcome to Himalai Expense Analysis API", "docs_url": "/docs"}
 
 @app.get("/db-health")
-async def db_health():
+def db_health():
     success, message = test_db_connection()
     return {"status": "ok" if success else "error", "message": message}
 
-# Include all routers
-app.include_router(auth.router, prefix=settings.API_V1_STR)
-app.include_router(health.router, prefix=settings.API_V1_STR)
-app.include_router(transaction.router, prefix=settings.API_V1_STR)
-app.include_router(file_upload.router, prefix=settings.API_V1_STR)
-app.include_router(
-    user_detail_router,
-    prefix="/api/users",
-    tags=["Users"]
-)
-app.include_router(voucher_router, prefix="/api/vouchers", tags=["Vouchers"])
-
-
-# Startup/shutdown events#
-@app.on_event("startup")
-async def startup_event():
-    logger.info(f"Starting {settings.APP_NAME} (Environment: {settings.ENVIRONMENT})")
-    logger.debug(f"Allowed origins: {origins}")
-    logger.debug(f"Groq model: {settings.GROQ_MODEL}")
-    
-    success, message = test_db_connection()
-    if success:
-        logger.info("Database connection successful")
-    else:
-        logger.error(f"Database connection failed: {message}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down application")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,14 +1,14 @@
-from sqlalchemy import Column, String, Date, Time, Float, ForeignKey, DateTime
+from sqlalchemy import Column, String, Text, Date, Time, Float, ForeignKey, DateTime, Index, DDL, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
-import uuid
+from ..utils.helpers import uuid7
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered for insert locality
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     transaction_id = Column(String, nullable=True)
     transaction_date = Column(Date, nullable=False)
@@ -19,7 +19,24 @@ class Transaction(Base):
     cr = Column(Float, default=0.0)
     source = Column(String, nullable=False)
     balance = Column(Float, nullable=False)
-    raw_data = Column(String, nullable=True)
+    raw_data = Column(Text, nullable=True)  # Original row as JSON; stored out of line (see DDL below)
     created_at = Column(DateTime, default=func.now())
 
-    user = relationship("User", back_populates="transactions")
\ No newline at end of file
+    user = relationship("User", back_populates="transactions")
+# Per-user listings in (date, time, id) newest-first order, matching the keyset pagination;
+# INCLUDE lets summaries skip the heap fetch
+Index(
+    "ix_tx_user_date",
+    Transaction.user_id,
+    Transaction.transaction_date.desc(),
+    Transaction.transaction_time.desc(),
+    Transaction.id.desc(),
+    postgresql_include=["description", "dr", "cr", "balance"],
+)
+
+# Keep the raw JSON blob in TOAST so the hot financial columns pack densely into heap pages
+event.listen(
+    Transaction.__table__,
+    "after_create",
+    DDL("ALTER TABLE transactions ALTER COLUMN raw_data SET STORAGE EXTERNAL").execute_if(dialect="postgresql"),
+)
@@ -1,8 +1,9 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Index, DDL, event, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
 from ..core.database import Base
+from ..utils.helpers import uuid7
 import uuid
 from app.models.voucher import user_vouchers
 
@@ -10,10 +11,10 @@ from app.models.voucher import user_vouchers
 class User(Base):
     __tablename__ = "users"
 
-    # Use PostgreSQL's UUID type for ID
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
-    email = Column(String, unique=True, index=True, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
+    # Use PostgreSQL's UUID type for ID (time-ordered v7 for index locality)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    email = Column(String, unique=True, nullable=False)
+    username = Column(String, unique=True, nullable=False)
     password = Column(String, nullable=False)
     first_name = Column(String)
     last_name = Column(String)
@@ -31,13 +32,29 @@ class User(Base):
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
     created_vouchers = relationship("Voucher", back_populates="created_by")
     purchased_vouchers = relationship("Voucher", secondary="user_vouchers", back_populates="purchased_by")
-    
+
+# Sort key for the admin user list. created_at is nullable, and NULLs would drop out of a
+# keyset seek, so they sort as the oldest possible timestamp instead
+USER_CREATED_SORT_KEY = func.coalesce(User.created_at, literal_column("'0001-01-01 00:00:00'::timestamp", DateTime))
+
+# Keyset pagination for the admin user list (newest first)
+Index("ix_users_created_at_id", USER_CREATED_SORT_KEY.desc(), User.id.desc())
+
+# Trigram GIN indexes so the admin search's ILIKE '%term%' filters can use an index
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+Index("ix_users_email_trgm", User.email, postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"})
+Index("ix_users_first_name_trgm", User.first_name, postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"})
+Index("ix_users_last_name_trgm", User.last_name, postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"})
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
 
     # Use PostgreSQL's UUID type for ID
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     points = Column(Integer, default=0)
     total_uploads = Column(Integer, default=0)
@@ -58,10 +75,10 @@ class UserProfile(Base):
 class UserSession(Base):
     __tablename__ = "user_sessions"
 
-    # Use PostgreSQL's UUID type for ID
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    # Use PostgreSQL's UUID type for ID (time-ordered v7 for index locality)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    session_token = Column(String, unique=True, index=True, nullable=False)
+    session_token = Column(String, unique=True, nullable=False)
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     expires_at = Column(DateTime, nullable=False)
@@ -1,8 +1,11 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Float, Boolean, Integer, DateTime, ForeignKey, Enum, Table
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import Column, String, Float, Boolean, Integer, DateTime, ForeignKey, Enum, Table, Index, and_, or_, text
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from enum import Enum as PyEnum
 
 from app.core.database import Base
@@ -13,7 +16,7 @@ user_vouchers = Table(
     Base.metadata,
     Column('user_id', UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True),
     Column('voucher_id', UUID(as_uuid=True), ForeignKey('vouchers.id'), primary_key=True),
-    Column('purchased_at', DateTime, default=datetime.utcnow)
+    Column('purchased_at', DateTime, server_default=func.timezone('UTC', func.now()))
 )
 
 class VoucherType(str, PyEnum):
@@ -24,20 +27,21 @@ class Voucher(Base):
     __tablename__ = "vouchers"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    code = Column(String, unique=True, index=True, nullable=True)  # Optional now
+    code = Column(String, unique=True, nullable=True)  # Optional now
     title = Column(String, nullable=False)  # Title of the voucher
     description = Column(String, nullable=True)
     points_cost = Column(Integer, nullable=False, default=0)  # NEW: Cost in points
     amount = Column(Float, nullable=False)  # Discount amount
-    type = Column(String, nullable=False, default=VoucherType.FIXED)
-    valid_from = Column(DateTime, default=datetime.utcnow)
+    type = Column(Enum(VoucherType, name="voucher_type", native_enum=True), nullable=False, server_default=VoucherType.FIXED.value)
+    # Naive UTC like the baseline datetime.utcnow defaults; a bare now() would be cast to session local time
+    valid_from = Column(DateTime, server_default=func.timezone('UTC', func.now()))
     valid_until = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
     usage_limit = Column(Integer, default=1)  # How many times it can be used
     usage_count = Column(Integer, default=0)  # How many times it has been used
     min_purchase_amount = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.timezone('UTC', func.now()))
+    updated_at = Column(DateTime, server_default=func.timezone('UTC', func.now()), onupdate=func.timezone('UTC', func.now()))
     image_url = Column(String, nullable=True)  # URL to an image of the voucher
     
     # Creator relationship
@@ -47,12 +51,40 @@ class Voucher(Base):
     # Users who purchased this voucher
     purchased_by = relationship("User", secondary=user_vouchers, back_populates="purchased_vouchers")
     
-    def is_valid(self):
-        """Check if voucher is currently valid"""
-        now = datetime.utcnow()
-        return (
+    __table_args__ = (
+        # now() is not immutable, so the time bound can't live in the predicate;
+        # active vouchers are indexed by expiry and the range check uses the index
+        Index("ix_voucher_active_current", "valid_until", postgresql_where=text("is_active")),
+    )
+    
+    def is_valid_at(self, now: Optional[datetime] = None) -> bool:
+        """
+        Check validity at a given moment.
+        Batch callers can take `now` once and pass it to every voucher.
+        """
+        if now is None:
+            # Columns are naive UTC, so compare against a naive UTC timestamp
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return bool(
             self.is_active and
             (self.valid_from is None or now >= self.valid_from) and
             (self.valid_until is None or now <= self.valid_until) and
             (self.usage_limit is None or self.usage_count < self.usage_limit)
-        )
\ No newline at end of file
+        )
+    
+    @hybrid_property
+    def is_valid(self):
+        """Check if voucher is currently valid"""
+        return self.is_valid_at()
+    
+    @is_valid.expression
+    def is_valid(cls):
+        """Same check as a SQL predicate, so listings can filter in the database"""
+        # The columns are naive UTC; compare against naive UTC too, independent of the session TimeZone
+        now_utc = func.timezone('UTC', func.now())
+        return and_(
+            cls.is_active.is_(True),
+            or_(cls.valid_from.is_(None), cls.valid_from <= now_utc),
+            or_(cls.valid_until.is_(None), cls.valid_until >= now_utc),
+            or_(cls.usage_limit.is_(None), cls.usage_count < cls.usage_limit),
+        )
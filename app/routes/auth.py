@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Header
-from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
-from jose import jwt, JWTError
+from datetime import datetime
+from jose import JWTError
 from ..core.database import get_db
 from ..schemas.user import UserCreateRequest, UserResponse, TokenResponse, VerificationRequest
-from ..services.auth_service import create_user, verify_user, authenticate_user, create_access_token
+from ..services.auth_service import create_user, verify_user, authenticate_user, create_token_pair, get_admin_info, update_last_login
 from ..utils.email import send_verification_email
 from ..models.user import User
-from ..core.config import settings
+from ..core.jwt_cache import decode_cached
 
 router = APIRouter(tags=["Authentication"], prefix="/auth")
 
@@ -28,7 +29,7 @@ router = APIRouter(tags=["Authentication"], prefix="/auth")
                     }
                 }
             })
-async def signup(
+def signup(
     user_request: UserCreateRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -39,22 +40,25 @@ async def signup(
     # Convert request model to internal model with username
     user_data = user_request.to_user_create()
     
-    # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    # Check email and username in a single round-trip
+    conditions = [User.email == user_data.email]
+    if user_data.username:
+        conditions.append(User.username == user_data.username)
+    taken = db.execute(
+        select(User.email, User.username).where(or_(*conditions))
+    ).all()
+    
+    if any(row.email == user_data.email for row in taken):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Check if username already exists
-    if user_data.username:
-        existing_username = db.query(User).filter(User.username == user_data.username).first()
-        if existing_username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
+    if taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
     
     # Create the user
     user = create_user(db, user_data)
@@ -69,7 +73,8 @@ async def signup(
     return user
 
 @router.post("/login", response_model=TokenResponse)
-async def login(
+def login(
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -92,33 +97,21 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email},
-        expires_delta=access_token_expires
-    )
-    
-    # Create refresh token (optional)
-    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token = create_access_token(
-        data={"sub": user.email, "refresh": True},
-        expires_delta=refresh_token_expires
-    )
+    # Create access and refresh tokens
+    access_token, refresh_token = create_token_pair(user.email)
     
-    # Update last login timestamp
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Update last login timestamp after the response is sent
+    background_tasks.add_task(update_last_login, user.id, datetime.utcnow())
     
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "user": user
+        "user": UserResponse.model_validate(user)  # built once; no second pass over the ORM object
     }
 
 @router.post("/verify", response_model=TokenResponse)
-async def verify_email(
+def verify_email(
     verification_data: VerificationRequest,
     db: Session = Depends(get_db)
 ):
@@ -126,63 +119,49 @@ async def verify_email(
     Verify email with verification code and return JWT tokens.
     """
     # Verify the code
-    verified = verify_user(db, verification_data.code, verification_data.email)
-    if not verified:
+    user = verify_user(db, verification_data.code, verification_data.email)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid verification code or email"
         )
     
-    # Get the user
-    user = db.query(User).filter(User.email == verification_data.email).first()
-    
     # Create tokens as in login endpoint
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email},
-        expires_delta=access_token_expires
-    )
-    
-    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token = create_access_token(
-        data={"sub": user.email, "refresh": True},
-        expires_delta=refresh_token_expires
-    )
+    access_token, refresh_token = create_token_pair(user.email)
     
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "user": user
+        "user": UserResponse.model_validate(user)  # built once; no second pass over the ORM object
     }
 
 @router.get("/check-admin")
-async def check_admin_status(
+def check_admin_status(
     email: str,
     db: Session = Depends(get_db)
 ):
     """
     Check if a user is an admin by email.
     """
-    user = db.query(User).filter(User.email == email).first()
+    info = get_admin_info(db, email)
     
-    if not user:
+    if not info:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
         
     return {
-        "is_admin": user.is_admin,
-        "user_id": str(user.id),
-        "email": user.email,
-        "username": user.username
+        "is_admin": info.is_admin,
+        "user_id": str(info.user_id),
+        "email": info.email,
+        "username": info.username
     }
 
 @router.post("/logout")
-async def logout(
-    authorization: str = Header(None),
-    db: Session = Depends(get_db)
+def logout(
+    authorization: str = Header(None)
 ):
     """
     Logout endpoint - invalidates the current session
@@ -200,20 +179,11 @@ async def logout(
     token = authorization.split(" ")[1]
     
     try:
-        # Decode token to get user information
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
+        # Validate the token; nothing is stored server-side, so no DB access is needed
+        decode_cached(token)
         
         # Optional: For enhanced security, you could implement token blacklisting here
         # For example, store token in a Redis blacklist with expiry = token's remaining lifetime
-        
-        # Update last session info if needed
-        user = db.query(User).filter(User.email == email).first()
-        if user:
-            # Optional: Update user's session info if needed
-            # user.last_logout = datetime.utcnow()
-            # db.commit()
-            pass
             
         return {"status": "success", "message": "Successfully logged out"}
         
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Form
+from sqlalchemy import exists, select, update
 from sqlalchemy.orm import Session
 from uuid import UUID
 from datetime import datetime
@@ -9,7 +10,7 @@ import json
 import re
 
 from ..core.database import get_db
-from ..models.user import User
+from ..models.user import User, UserProfile
 from ..models.transaction import Transaction
 from ..services.file_processor import detect_format, process_file
 from ..services.transaction_service import csv_to_transactions
@@ -19,6 +20,25 @@ router = APIRouter(
     tags=["file processing"]
 )
 
+@router.post("/detect-source")
+async def detect_file_source(file: UploadFile = File(...)):
+    """
+    Detect which bank/platform a statement comes from using only its first pages/rows,
+    so the client can confirm before uploading the full file for import.
+    """
+    result = await process_file(file, preview_only=True)
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result["message"]
+        )
+    
+    return {
+        "format": result["format"],
+        "source": result["source"],
+        "preview": result["data"]
+    }
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -29,8 +49,7 @@ async def upload_file(
     Process financial file upload and save transactions
     """
     # Verify the user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not db.scalar(select(exists().where(User.id == user_id))):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found"
@@ -57,12 +76,18 @@ async def upload_file(
         )
         
         # Update user profile statistics if available
+        # Single atomic UPDATE: no read-modify-write race between concurrent uploads
         if save_result["success"]:
-            if hasattr(user, 'profile') and user.profile:
-                user.profile.total_uploads = user.profile.total_uploads + 1
-                user.profile.total_transactions = user.profile.total_transactions + save_result["count"] if hasattr(user.profile, "total_transactions") else save_result["count"]
-                user.profile.points = user.profile.points + min(10, save_result["count"]) # Award points based on transactions
-                db.commit()
+            db.execute(
+                update(UserProfile)
+                .where(UserProfile.user_id == user_id)
+                .values(
+                    total_uploads=UserProfile.total_uploads + 1,
+                    total_transactions=UserProfile.total_transactions + save_result["count"],
+                    points=UserProfile.points + min(10, save_result["count"])  # Award points based on transactions
+                )
+            )
+            db.commit()
         
         return save_result
             
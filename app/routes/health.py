@@ -4,7 +4,7 @@ from ..core.database import test_db_connection
 router = APIRouter(tags=["Health"])
 
 @router.get("/health", operation_id="himalai_health_check")
-async def health_check():
+def health_check():
     """
     Check the health of the API and its dependencies.
     """
@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Optional
 from uuid import UUID
+from datetime import datetime
 
 from ..core.database import get_db
 from ..schemas.transaction import Transaction, TransactionCreate, TransactionUpdate
 from ..models.user import User
+from ..utils.helpers import decode_cursor, encode_cursor
 from ..services.transaction_service import (
     create_transaction,
-    get_transaction_by_id,
+    delete_user_transaction,
+    get_transaction_with_requester,
     get_transactions,
+    iter_transactions_ndjson,
+    update_user_transaction,
     create_transactions_batch
 )
 
@@ -18,30 +26,72 @@ router = APIRouter(
     tags=["transactions"]
 )
 
-@router.get("/", response_model=List[Transaction])
-async def get_all_transactions(
+def _raise_if_user_missing(db: Session, user_id: UUID) -> None:
+    """
+    404 when the user does not exist.
+    Only called on the miss path, so successful requests skip the extra lookup.
+    """
+    if not db.scalar(select(exists().where(User.id == user_id))):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+@router.get("/", response_class=ORJSONResponse, response_model=None)
+def get_all_transactions(
     requesting_user_id: UUID,
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(1000, ge=1, le=1000)
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page; replaces skip")
 ):
     """
     Get all transactions for the requesting user.
+    Rows are returned as-is through orjson, bypassing per-row Pydantic validation.
+    When another page exists, its cursor is sent in the X-Next-Cursor header.
     """
-    # Verify the user exists
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    position = None
+    if after:
+        try:
+            cursor_at, cursor_id = decode_cursor(after)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        position = (cursor_at.date(), cursor_at.time(), cursor_id)
+    
+    # Fetch one extra row to know whether there is a next page;
+    # an empty page may mean the user doesn't exist
+    transactions = get_transactions(
+        db=db, user_id=requesting_user_id, skip=skip, limit=limit + 1, after=position
+    )
+    if not transactions:
+        _raise_if_user_missing(db, requesting_user_id)
     
-    # Fetch transactions
-    transactions = get_transactions(db=db, user_id=user.id, skip=skip, limit=limit)
-    return transactions
+    headers = {}
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        headers["X-Next-Cursor"] = encode_cursor(
+            datetime.combine(last["date"], last["time"]), last["id"]
+        )
+    return ORJSONResponse(transactions, headers=headers)
+
+@router.get("/export")
+def export_transactions(
+    requesting_user_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """
+    Stream all of the requesting user's transactions as newline-delimited JSON.
+    Suited to large pulls: rows are sent as they are read instead of building one big list.
+    """
+    _raise_if_user_missing(db, requesting_user_id)
+    return StreamingResponse(
+        iter_transactions_ndjson(requesting_user_id),
+        media_type="application/x-ndjson"
+    )
 
 @router.post("/", response_model=Transaction, status_code=status.HTTP_201_CREATED)
-async def create_new_transaction(
+def create_new_transaction(
     transaction_data: TransactionCreate,
     requesting_user_id: UUID,
     db: Session = Depends(get_db),
@@ -49,19 +99,18 @@ async def create_new_transaction(
     """
     Create a new transaction for the requesting user.
     """
-    # Verify the user exists
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
+    # Create transaction; the user_id foreign key rejects unknown users
+    try:
+        return create_transaction(db=db, transaction_data=transaction_data, user_id=requesting_user_id)
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    # Create transaction
-    return create_transaction(db=db, transaction_data=transaction_data, user_id=user.id)
 
 @router.patch("/{transaction_id}", response_model=Transaction)
-async def update_transaction(
+def update_transaction(
     transaction_id: UUID,
     transaction_data: TransactionUpdate,
     requesting_user_id: UUID,
@@ -70,32 +119,22 @@ async def update_transaction(
     """
     Update an existing transaction for the requesting user.
     """
-    # Verify the user exists
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Fetch the transaction
-    transaction = get_transaction_by_id(db=db, transaction_id=transaction_id, user_id=user.id)
+    transaction = update_user_transaction(
+        db=db,
+        transaction_id=transaction_id,
+        user_id=requesting_user_id,
+        values={field: getattr(transaction_data, field) for field in transaction_data.model_fields_set}
+    )
     if not transaction:
+        _raise_if_user_missing(db, requesting_user_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Transaction not found"
         )
-    
-    # Update transaction
-    for field, value in transaction_data.dict(exclude_unset=True).items():
-        setattr(transaction, field, value)
-    
-    db.commit()
-    db.refresh(transaction)
     return transaction
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_transaction(
+def delete_transaction(
     transaction_id: UUID,
     requesting_user_id: UUID,
     db: Session = Depends(get_db),
@@ -103,29 +142,16 @@ async def delete_transaction(
     """
     Delete a transaction for the requesting user.
     """
-    # Verify the user exists
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Fetch the transaction
-    transaction = get_transaction_by_id(db=db, transaction_id=transaction_id, user_id=user.id)
-    if not transaction:
+    if not delete_user_transaction(db=db, transaction_id=transaction_id, user_id=requesting_user_id):
+        _raise_if_user_missing(db, requesting_user_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Transaction not found"
         )
-    
-    # Delete transaction
-    db.delete(transaction)
-    db.commit()
     return None
 
 @router.get("/{transaction_id}", response_model=Transaction)
-async def get_transaction(
+def get_transaction(
     transaction_id: UUID,
     requesting_user_id: UUID,
     db: Session = Depends(get_db)
@@ -133,21 +159,20 @@ async def get_transaction(
     """
     Get specific transaction by ID
     """
-    # Verify the user exists
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
+    # One query answers: does the user exist, are they admin, and does the transaction exist
+    row = get_transaction_with_requester(db=db, transaction_id=transaction_id, requesting_user_id=requesting_user_id)
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    transaction = get_transaction_by_id(db=db, transaction_id=transaction_id)
-    
-    # Verify ownership or admin status
-    if transaction.user_id != user.id and not user.is_admin:
+    # Someone else's transaction looks the same as a missing one, so existence isn't leaked
+    transaction, _ = row
+    if transaction is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this transaction"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transaction not found"
         )
     
     return transaction
\ No newline at end of file
@@ -1,9 +1,15 @@
 from typing import List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, exists, func, select, tuple_, update
 from sqlalchemy.orm import Session
 from ..core.database import get_db
-from app.models.user import User, UserProfile
+from ..services.auth_service import invalidate_admin_info
+from app.core.deps import RequestingUser, get_requesting_user, invalidate_requesting_user, require_admin
+from app.models.user import USER_CREATED_SORT_KEY, User, UserProfile
+from app.models.voucher import Voucher, user_vouchers
+from app.utils.helpers import decode_cursor, encode_cursor
 from app.schemas.user import (
     UserResponse, PaginatedUserResponse,
     ProfileResponse, ProfileUpdate  # Import from schemas
@@ -13,173 +19,168 @@ router = APIRouter()
 
 @router.get("/", response_model=PaginatedUserResponse)
 def get_users(
-    requesting_user_id: UUID,
+    requesting_user: RequestingUser = Depends(require_admin),
     db: Session = Depends(get_db),
-    skip: int = Query(0, ge=0),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    include_total: bool = False
 ):
     """
-    Get all users with pagination and optional search.
+    Get all users, newest first, with keyset pagination and optional search.
     Only accessible by admin users.
     """
-    # Verify the requesting user exists and is an admin
-    requesting_user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not requesting_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Requesting user not found"
-        )
-    
-    if not requesting_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions. Admin access required"
-        )
-    
-    # Continue with the existing logic
-    query = db.query(User)
+    filters = []
     
     # Apply search if provided
     if search:
         search_term = f"%{search.lower()}%"
-        query = query.filter(
+        filters.append(
             (User.email.ilike(search_term)) |
             (User.first_name.ilike(search_term)) |
             (User.last_name.ilike(search_term))
         )
     
-    # Get total count for pagination
-    total = query.count()
-    
-    # Apply pagination
-    users = query.offset(skip).limit(limit).all()
+    # COUNT(*) scans every matching row, so it is opt-in
+    total = db.scalar(select(func.count()).select_from(User).where(*filters)) if include_total else None
+    
+    # Seek past the cursor on (created_at, id) instead of OFFSET-scanning earlier pages
+    if after:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(after)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        filters.append(tuple_(USER_CREATED_SORT_KEY, User.id) < tuple_(cursor_created_at, cursor_id))
+    
+    # Flat rows with the profile columns joined in; no ORM objects are built.
+    # One extra row is fetched to know whether there is a next page
+    rows = db.execute(
+        select(
+            User.id, User.email, User.username, User.first_name, User.last_name,
+            User.is_active, User.is_admin, User.created_at,
+            func.coalesce(UserProfile.points, 0).label("points"),
+            func.coalesce(UserProfile.total_uploads, 0).label("total_uploads"),
+            USER_CREATED_SORT_KEY.label("sort_created_at"),
+        )
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .where(*filters)
+        .order_by(USER_CREATED_SORT_KEY.desc(), User.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].sort_created_at, rows[-1].id)
     
     # Format response with user profiles included
-    result = []
-    for user in users:
-        user_dict = {
-            "id": str(user.id),
-            "email": user.email,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "is_active": user.is_active,
-            "is_admin": user.is_admin,
-            "created_at": user.created_at,
-            "profile": {
-                "points": user.profile.points if user.profile else 0,
-                "total_uploads": user.profile.total_uploads if user.profile else 0,
-                # Include other profile fields as needed
-            }
+    result = [
+        {
+            "id": row.id,
+            "email": row.email,
+            "username": row.username,
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "is_active": row.is_active,
+            "is_admin": row.is_admin,
+            "created_at": row.created_at,
+            "profile": {"points": row.points, "total_uploads": row.total_uploads}
         }
-        result.append(user_dict)
+        for row in rows
+    ]
     
-    return {
+    # Returned as a response directly, so FastAPI skips re-validating every item
+    return ORJSONResponse({
         "items": result,
-        "total": total,
-        "page": skip // limit + 1,
-        "pages": (total + limit - 1) // limit
-    }
+        "next_cursor": next_cursor,
+        "total": total
+    })
 
 @router.get("/profile", response_model=ProfileResponse)
 def get_user_profile(
-    requesting_user_id: UUID,
+    user: RequestingUser = Depends(get_requesting_user),
     db: Session = Depends(get_db)
 ):
     """
     Get the current user's profile with points
     """
-    user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Return profile, create one if it doesn't exist
-    if not user.profile:
+    profile = db.query(UserProfile).filter(UserProfile.user_id == user.id).first()
+    if not profile:
         profile = UserProfile(user_id=user.id, points=0, total_uploads=0)
         db.add(profile)
         db.commit()
         db.refresh(profile)
-        return profile
     
-    return user.profile
+    return profile
 
 @router.patch("/{user_id}/profile", response_model=ProfileResponse)
 def update_user_profile(
     user_id: UUID,
     profile_data: ProfileUpdate,
-    requesting_user_id: UUID,
+    requesting_user: RequestingUser = Depends(get_requesting_user),
     db: Session = Depends(get_db)
 ):
     """
     Update user profile.
     Users can only update their own profile unless they are an admin.
     """
-    # Check if requesting user exists
-    requesting_user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not requesting_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Requesting user not found"
-        )
-    
     # Check permissions - users can only update their own profile unless they are admin
-    if str(requesting_user_id) != str(user_id) and not requesting_user.is_admin:
+    if requesting_user.id != user_id and not requesting_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update another user's profile"
         )
     
-    # Get the target user
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    values = {
+        field: getattr(profile_data, field)
+        for field in profile_data.model_fields_set
+        if getattr(profile_data, field) is not None
+    }
     
-    # Get or create profile
-    profile = user.profile
-    if not profile:
-        profile = UserProfile(user_id=user.id, points=0, total_uploads=0)
-        db.add(profile)
+    # Update the existing profile in one UPDATE ... RETURNING round-trip
+    if values:
+        profile = db.execute(
+            update(UserProfile).where(UserProfile.user_id == user_id).values(**values).returning(UserProfile)
+        ).scalar_one_or_none()
+    else:
+        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
     
-    # Update profile fields
-    for field, value in profile_data.dict(exclude_unset=True).items():
-        if value is not None:
+    # No profile yet: the target user only needs an existence check before one is created
+    if not profile:
+        if not db.execute(select(exists().where(User.id == user_id))).scalar():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        profile = UserProfile(user_id=user_id, points=0, total_uploads=0)
+        for field, value in values.items():
             setattr(profile, field, value)
+        db.add(profile)
+        db.commit()
+        db.refresh(profile)
+        return profile
     
-    db.commit()
-    db.refresh(profile)
+    if values:
+        db.commit()
     return profile
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: UUID,
-    requesting_user_id: UUID,
+    requesting_user: RequestingUser = Depends(get_requesting_user),
     db: Session = Depends(get_db),
 ):
     """
     Get a specific user by ID.
     Admin can get any user. Regular users can only get their own data.
     """
-    requesting_user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not requesting_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Requesting user not found"
-        )
-    
     if not requesting_user.is_admin and str(requesting_user.id) != str(user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -192,68 +193,51 @@ def get_user(
 def update_user(
     user_id: UUID,
     user_data: dict,
-    requesting_user_id: UUID,
+    requesting_user: RequestingUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """
     Update a user. Admin only.
     """
-    requesting_user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not requesting_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Requesting user not found"
-        )
-    
-    if not requesting_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions. Admin access required"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    previous_email = user.email
     for field, value in user_data.items():
         setattr(user, field, value)
     
     db.commit()
     db.refresh(user)
+    invalidate_admin_info(previous_email, user.email)
+    invalidate_requesting_user(user.id)
     return user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: UUID,
-    requesting_user_id: UUID,
+    requesting_user: RequestingUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """
     Delete a user. Admin only.
     """
-    requesting_user = db.query(User).filter(User.id == requesting_user_id).first()
-    if not requesting_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Requesting user not found"
-        )
-    
-    if not requesting_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions. Admin access required"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # Profile, sessions and transactions go with the ON DELETE CASCADE foreign keys,
+    # so nothing is loaded into the session; voucher links are cleared explicitly
+    db.execute(delete(user_vouchers).where(user_vouchers.c.user_id == user_id))
+    db.execute(update(Voucher).where(Voucher.created_by_id == user_id).values(created_by_id=None))
+    email = db.execute(delete(User).where(User.id == user_id).returning(User.email)).scalar_one_or_none()
+    if email is None:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    db.delete(user)
     db.commit()
+    invalidate_admin_info(email)
+    invalidate_requesting_user(user_id)
     return None
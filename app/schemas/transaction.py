@@ -1,11 +1,13 @@
-from pydantic import BaseModel, UUID4, Field
-from typing import Optional
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
+from typing import Annotated, Optional
 from datetime import date, time, datetime
+from uuid import UUID
 
 class TransactionBase(BaseModel):
     transaction_id: Optional[str] = None
-    date: date
-    time: time
+    # The model columns are transaction_date/transaction_time; both names are accepted
+    date: Annotated[date, Field(validation_alias=AliasChoices("date", "transaction_date"))]
+    time: Annotated[time, Field(validation_alias=AliasChoices("time", "transaction_time"))]
     description: Optional[str] = None
     dr: float = 0.0
     cr: float = 0.0
@@ -29,12 +31,12 @@ class TransactionUpdate(BaseModel):
     raw_data: Optional[str] = None
 
 class TransactionInDB(TransactionBase):
-    id: UUID4
-    user_id: UUID4
-    created_at: datetime
+    # Plain UUID: ids are time-ordered v7, which UUID4 validation would reject
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+    id: UUID
+    user_id: UUID
+    created_at: datetime
 
 class Transaction(TransactionInDB):
     pass
\ No newline at end of file
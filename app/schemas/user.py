@@ -1,50 +1,71 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import List, Optional, Union, Dict, Any
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+from typing import Annotated, List, Optional, Union
+from email_validator import validate_email
+from functools import lru_cache
 
 from datetime import datetime
 import re
 import uuid
 
+# Password policy checks, compiled once instead of on every signup
+_PW_UPPER = re.compile(r'[A-Z]')
+_PW_LOWER = re.compile(r'[a-z]')
+_PW_DIGIT = re.compile(r'[0-9]')
+
+@lru_cache(maxsize=4096)
+def _normalize_email(value: str) -> str:
+    """
+    Syntax-check an address and return its normalized form.
+    Cached so repeat submissions of the same address (e.g. verify retries) skip re-parsing;
+    invalid addresses raise EmailNotValidError (a ValueError) and are not cached.
+    """
+    return validate_email(value, check_deliverability=False).normalized
+
+Email = Annotated[str, AfterValidator(_normalize_email)]
+
 class UserBase(BaseModel):
-    email: EmailStr
-    username: Optional[str] = None
+    email: Email
+    username: Optional[str] = Field(None, validate_default=True)
     
-    @validator('username', pre=True, always=True)
-    def default_username_from_email(cls, v, values):
-        if not v and 'email' in values:
-            email_username = values['email'].split('@')[0]
+    @field_validator('username', mode='before')
+    @classmethod
+    def default_username_from_email(cls, v, info: ValidationInfo):
+        if not v and 'email' in info.data:
+            email_username = info.data['email'].split('@')[0]
             return email_username
         return v
 
 # This schema is used specifically for the API input - no username field
 class UserCreateRequest(BaseModel):
-    email: EmailStr
+    email: Email
     password: str = Field(..., min_length=8)
     confirm_password: str
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def password_strength(cls, v):
         if len(v) < 8:
             raise ValueError('Password must be at least 8 characters')
-        if not re.search(r'[A-Z]', v):
+        if not _PW_UPPER.search(v):
             raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if not _PW_LOWER.search(v):
             raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'[0-9]', v):
+        if not _PW_DIGIT.search(v):
             raise ValueError('Password must contain at least one number')
         return v
     
-    @validator('confirm_password')
-    def passwords_match(cls, v, values):
-        if 'password' in values and v != values['password']:
+    @field_validator('confirm_password')
+    @classmethod
+    def passwords_match(cls, v, info: ValidationInfo):
+        if 'password' in info.data and v != info.data['password']:
             raise ValueError('Passwords do not match')
         return v
     
     # Convert to UserCreate model which includes the username
     def to_user_create(self) -> 'UserCreate':
-        user_data = self.dict()
+        user_data = self.model_dump()
         return UserCreate(**user_data)
 
 # Internal model that includes username
@@ -55,16 +76,17 @@ class UserCreate(UserBase):
     last_name: Optional[str] = None
 
 class UserResponse(UserBase):
+    # Response-only schemas are built on first use instead of at import
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
+    
     id: Union[str, uuid.UUID]
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     is_active: bool
     created_at: datetime
     
-    class Config:
-        orm_mode = True
-        
-    @validator('id', pre=True)
+    @field_validator('id', mode='before')
+    @classmethod
     def str_uuid(cls, v):
         if isinstance(v, uuid.UUID):
             return str(v)
@@ -77,6 +99,8 @@ class UserProfileCreate(UserProfileBase):
     pass
 
 class UserProfileResponse(UserProfileBase):
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
+    
     id: str
     user_id: str
     points: int
@@ -87,52 +111,65 @@ class UserProfileResponse(UserProfileBase):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        orm_mode = True
+    @field_validator('id', 'user_id', mode='before')
+    @classmethod
+    def str_uuid(cls, v):
+        if isinstance(v, uuid.UUID):
+            return str(v)
+        return v
 
 class UserWithProfile(UserResponse):
     profile: Optional[UserProfileResponse] = None
-    
-    class Config:
-        orm_mode = True
 
 class TokenData(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+    
     access_token: str
     token_type: str
     user: UserResponse
 
 class TokenResponse(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+    
     access_token: str
     refresh_token: str
     token_type: str
     user: UserResponse
 
 class VerificationRequest(BaseModel):
-    email: EmailStr
+    email: Email
     code: str
 
-class PaginatedUserResponse(BaseModel):
-    items: List[Dict[str, Any]]  # Using Dict instead of UserResponse to avoid circular refs
-    total: int
-    page: int
-    pages: int
-    
-    class Config:
-        from_attributes = True
-        orm_mode = True
-
 # Add these profile schemas to your existing user schemas
 
 class ProfileResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
+    
     points: int = 0
     total_uploads: int = 0
-    
-    class Config:
-        from_attributes = True
-        orm_mode = True
 
 class ProfileUpdate(BaseModel):
     points: Optional[int] = None
     total_uploads: Optional[int] = None
 
+class UserListItem(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+    
+    id: uuid.UUID
+    email: str
+    username: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    is_active: bool
+    is_admin: bool
+    created_at: datetime
+    profile: ProfileResponse
+
+class PaginatedUserResponse(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+    
+    items: List[UserListItem]
+    next_cursor: Optional[str] = None  # Pass as `after` to fetch the next page; None on the last page
+    total: Optional[int] = None  # Only filled in when include_total=true
+
 #
\ No newline at end of file
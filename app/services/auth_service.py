@@ -1,34 +1,53 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.orm import Session, load_only
 from datetime import datetime, timedelta
-import random
-import string
+import functools
+import hashlib
+import hmac
+import secrets
 import uuid
 from ..models.user import User, UserProfile
 from ..schemas.user import UserCreate
-from passlib.context import CryptContext
-import logging
+from ..utils.helpers import uuid7
+from ..utils.cache import TTLCache
+import bcrypt
 from ..core.logging import logger
-from jose import jwt
-from typing import Optional
+from jose import jwk, jwt
+from typing import NamedTuple, Optional, Tuple
 from ..core.config import settings
+from ..core.database import SessionLocal
 
-# Silence the specific bcrypt warning
-logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.ERROR)
+# Password hashing (bcrypt C extension directly, without passlib's dispatch layer)
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """
+    Hash a password for storing.
+    `rounds` defaults to settings.CREDENTIAL_ROUNDS; existing hashes keep the cost they were made with.
+    """
+    salt = bcrypt.gensalt(rounds=rounds or settings.CREDENTIAL_ROUNDS)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@functools.cache
+def _dummy_password_hash() -> str:
+    """Throwaway hash at the configured cost, checked when the account doesn't exist."""
+    return get_password_hash(secrets.token_urlsafe(16))
 
-def get_password_hash(password: str) -> str:
-    """Hash a password for storing."""
-    return pwd_context.hash(password)
+# Successful (stored hash, password digest) checks; repeat logins within the window skip bcrypt.
+# Keyed on the stored hash, so a password change never matches an old entry
+_verified_passwords = TTLCache(maxsize=10000, ttl=30)
+# Per-process secret for the cache keys, so the entries are never a plain fast hash of a password
+_VERIFIED_PASSWORD_KEY = secrets.token_bytes(32)
 
 # Password verification
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except ValueError:
+        # Malformed or non-bcrypt hash stored for this user
+        return False
 
 def generate_verification_code() -> str:
     """Generate a random 6-digit verification code."""
-    return ''.join(random.choices(string.digits, k=6))
+    return f"{secrets.randbelow(1_000_000):06d}"
 
 def create_user(db: Session, user_data: UserCreate) -> User:
     """
@@ -41,7 +60,7 @@ def create_user(db: Session, user_data: UserCreate) -> User:
     
     # Create User instance
     db_user = User(
-        id=uuid.uuid4(),  # Don't convert to string - keep as UUID object
+        id=uuid7(),  # Don't convert to string - keep as UUID object
         email=user_data.email,
         username=user_data.username or user_data.email.split('@')[0],
         password=hashed_password,
@@ -52,19 +71,15 @@ def create_user(db: Session, user_data: UserCreate) -> User:
         vr_code_expires=datetime.utcnow() + timedelta(hours=24)  # Code expires in 24 hours
     )
     
-    # Add and flush to get the user ID
-    db.add(db_user)
-    db.flush()
-    
-    # Create user profile
+    # Create user profile; the id is generated client-side, so no flush is needed to learn it
     db_profile = UserProfile(
         id=uuid.uuid4(),  # Don't convert to string - keep as UUID object
         user_id=db_user.id,
         points=10  # Start with 10 points as a welcome bonus
     )
     
-    # Add both user and profile
-    db.add(db_profile)
+    # Add both user and profile; the unit of work inserts the user first (FK order) in one commit
+    db.add_all([db_user, db_profile])
     db.commit()
     db.refresh(db_user)
     
@@ -75,20 +90,37 @@ def authenticate_user(db: Session, username_or_email: str, password: str) -> Opt
     Authenticate a user by username/email and password.
     Returns the user if authentication is successful, None otherwise.
     """
-    # Check if input is email or username
-    if "@" in username_or_email:
-        user = db.query(User).filter(User.email == username_or_email).first()
-    else:
-        user = db.query(User).filter(User.username == username_or_email).first()
+    # One query, limited to the hash plus the columns login puts in its response
+    login_column = User.email if "@" in username_or_email else User.username
+    user = (
+        db.query(User)
+        .options(load_only(
+            User.id, User.email, User.username, User.password, User.first_name,
+            User.last_name, User.is_active, User.created_at
+        ))
+        .filter(login_column == username_or_email)
+        .first()
+    )
     
     if not user:
+        # Spend the same bcrypt time as a real check so unknown accounts can't be spotted by latency
+        verify_password(password, _dummy_password_hash())
         return None
     
-    if not verify_password(password, user.password):
-        return None
+    cache_key = (
+        user.password,
+        hmac.new(_VERIFIED_PASSWORD_KEY, password.encode("utf-8"), hashlib.sha256).digest()
+    )
+    if not _verified_passwords.get(cache_key):
+        if not verify_password(password, user.password):
+            return None
+        _verified_passwords.set(cache_key, True)
     
     return user
 
+# HMAC key object built once instead of on every jwt.encode call
+_SIGNING_KEY = jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Create a JWT token with the provided data and expiration time.
@@ -101,28 +133,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
+    encoded_jwt = jwt.encode(to_encode, _SIGNING_KEY, algorithm=settings.ALGORITHM)
     
     return encoded_jwt
 
-def verify_user(db: Session, verification_code: str, email: str) -> bool:
+def create_token_pair(subject: str) -> Tuple[str, str]:
+    """
+    Create the (access, refresh) token pair for a user.
+    Both share one issue time and base claims; only exp and the refresh flag differ.
+    """
+    now = datetime.utcnow()
+    claims = {"sub": subject}
+    access_token = jwt.encode(
+        {**claims, "exp": now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)},
+        _SIGNING_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    refresh_token = jwt.encode(
+        {**claims, "refresh": True, "exp": now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)},
+        _SIGNING_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    return access_token, refresh_token
+
+def verify_user(db: Session, verification_code: str, email: str) -> Optional[User]:
     """
     Verify a user's email using the verification code.
-    Returns True if verification is successful, False otherwise.
+    Returns the verified user if successful, None otherwise.
     """
-    user = db.query(User).filter(User.email == email).first()
+    row = (
+        db.query(User.id, User.vr_code, User.vr_code_expires)
+        .filter(User.email == email)
+        .first()
+    )
     
-    if not user or user.vr_code != verification_code:
-        return False
+    if not row or row.vr_code != verification_code:
+        return None
     
     # Check if verification code has expired
-    if datetime.utcnow() > user.vr_code_expires:
-        return False
-    
-    # Activate the user
-    user.is_active = True
-    user.vr_code = None  # Clear the verification code
-    user.vr_code_expires = None
+    if not row.vr_code_expires or datetime.utcnow() > row.vr_code_expires:
+        return None
     
+    # Activate the user and clear the verification code
+    db.execute(
+        update(User)
+        .where(User.id == row.id)
+        .values(is_active=True, vr_code=None, vr_code_expires=None)
+    )
     db.commit()
-    return True
\ No newline at end of file
+    invalidate_admin_info(email)
+    return db.get(User, row.id)
+
+class AdminInfo(NamedTuple):
+    user_id: uuid.UUID
+    email: str
+    username: str
+    is_admin: bool
+    is_active: bool
+
+# Short-lived by-email cache for repeated admin checks (e.g. dashboard polling)
+_admin_info_cache = TTLCache(maxsize=5000, ttl=30)
+
+def get_admin_info(db: Session, email: str) -> Optional[AdminInfo]:
+    """
+    Look up a user's id/admin/active flags by email, cached for a few seconds.
+    Misses are not cached, so newly registered users show up immediately.
+    """
+    info = _admin_info_cache.get(email)
+    if info is not None:
+        return info
+    
+    row = db.query(User.id, User.email, User.username, User.is_admin, User.is_active).filter(
+        User.email == email
+    ).first()
+    if row is None:
+        return None
+    
+    info = AdminInfo(*row)
+    _admin_info_cache.set(email, info)
+    return info
+
+def invalidate_admin_info(*emails: Optional[str]) -> None:
+    """Drop cached admin info after a user's email, is_admin or is_active changes."""
+    for email in emails:
+        if email:
+            _admin_info_cache.pop(email)
+
+def update_last_login(user_id: uuid.UUID, logged_in_at: datetime) -> None:
+    """
+    Record a login timestamp off the request path (run as a background task).
+    Uses its own short-lived session since the request's session is already closed.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.id == user_id).values(last_login=logged_in_at))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to update last_login for {user_id}: {str(e)}")
+    finally:
+        db.close()
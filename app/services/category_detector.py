@@ -1,17 +1,8 @@
 import json
-from app.services.groq_service import ask_groq
+from typing import List
+from app.services.groq_service import ask_groq, ask_groq_batch
 
-async def detect_category_for_transaction(raw_data: str) -> str:
-    """
-    Detect transaction category using Groq AI based on raw transaction data.
-
-    Args:
-        raw_data: Raw transaction data as a JSON string.
-
-    Returns:
-        Predicted category as a string.
-    """
-    system_prompt = """You are a financial transaction categorizer.
+_CATEGORY_SYSTEM_PROMPT = """You are a financial transaction categorizer.
 Analyze the given raw transaction data and assign it to ONE of these categories:
 - Food & Dining
 - Transportation
@@ -32,12 +23,22 @@ Analyze the given raw transaction data and assign it to ONE of these categories:
 
 Respond ONLY with the category name, nothing else."""
 
+async def detect_category_for_transaction(raw_data: str) -> str:
+    """
+    Detect transaction category using Groq AI based on raw transaction data.
+
+    Args:
+        raw_data: Raw transaction data as a JSON string.
+
+    Returns:
+        Predicted category as a string.
+    """
     user_prompt = f"Transaction data: {raw_data}"
 
     try:
         # Call Groq API with minimal prompt
         response = await ask_groq(
-            system_prompt=system_prompt,
+            system_prompt=_CATEGORY_SYSTEM_PROMPT,
             user_prompt=user_prompt,
             temperature=0.1,  # Low temperature for consistent results
             max_tokens=20  # Short response needed
@@ -49,4 +50,22 @@ Respond ONLY with the category name, nothing else."""
         
     except Exception as e:
         print(f"Error detecting category: {str(e)}")
-        return "Other"  # Default fallback
\ No newline at end of file
+        return "Other"  # Default fallback
+
+async def detect_categories(raw_data: List[str]) -> List[str]:
+    """
+    Detect categories for many transactions with concurrent Groq calls.
+    Identical inputs are only sent once; results come back in input order,
+    with "Other" for any call that failed.
+    """
+    unique = list(dict.fromkeys(raw_data))
+    responses = await ask_groq_batch(
+        [(_CATEGORY_SYSTEM_PROMPT, f"Transaction data: {item}") for item in unique],
+        temperature=0.1,  # Low temperature for consistent results
+        max_tokens=20  # Short response needed
+    )
+    categories = {
+        item: "Other" if isinstance(response, BaseException) else response.strip()
+        for item, response in zip(unique, responses)
+    }
+    return [categories[item] for item in raw_data]
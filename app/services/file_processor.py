@@ -1,12 +1,18 @@
+import asyncio
 import io
-import pandas as pd
+import json
+import re
+import threading
 import pdfplumber
+import pypdfium2 as pdfium
+from python_calamine import CalamineWorkbook
 import csv
 from fastapi import UploadFile
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 # Import the ask_groq function
 from .groq_service import ask_groq
+from ..core.logging import logger
 
 def detect_format(file: UploadFile) -> str:
     """
@@ -30,128 +36,33 @@ def detect_format(file: UploadFile) -> str:
     
     return "unsupported"
 
-async def process_pdf(file_content: bytes) -> str:
-    """
-    Process PDF file and extract tables using pdfplumber
-    """
-    all_tables = []
-    
-    with io.BytesIO(file_content) as f:
-        # Open PDF with pdfplumber
-        with pdfplumber.open(f) as pdf:
-            # Process each page
-            for page in pdf.pages:
-                # Extract tables from the page
-                tables = page.extract_tables()
-                if tables:
-                    for table in tables:
-                        all_tables.append(table)
-                
-                # If no tables found, try to extract text and parse it
-                if not tables:
-                    text = page.extract_text()
-                    if text:
-                        # Split text into lines and try to extract structured data
-                        lines = text.split('\n')
-                        for line in lines:
-                            if line.strip():
-                                # Basic parsing - customize based on your statement format
-                                parts = line.split()
-                                if len(parts) >= 4:  # Assuming transaction lines have at least 4 parts
-                                    all_tables.append(parts)
-    
-    # Convert extracted data to CSV
-    csv_buffer = io.StringIO()
-    csv_writer = csv.writer(csv_buffer)
-    
-    # Write tables to CSV
-    for table in all_tables:
-        if isinstance(table, list) and all(isinstance(row, list) for row in table):
-            # Handle full table
-            for row in table:
-                csv_writer.writerow(row)
-        else:
-            # Handle row
-            csv_writer.writerow(table)
-    
-    # Print preview of CSV for debugging
-    csv_data = csv_buffer.getvalue()
-    print(f"CSV Preview: {csv_data[:500]}...")
-    
-    return csv_data
+# Outermost {...} span in an LLM reply that wraps its JSON in prose or code fences
+_JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
 
-async def process_excel(file_content: bytes, filename: str) -> str:
-    """
-    Process Excel file and convert to CSV string
-    """
-    # Determine engine based on file extension
-    engine = 'xlrd' if filename.lower().endswith('.xls') else 'openpyxl'
-    print(f"Processing Excel file with engine: {engine}")
-    
-    # Read Excel file into pandas DataFrame
-    with io.BytesIO(file_content) as f:
-        df = pd.read_excel(f, engine=engine)
-    
-    # Convert DataFrame to CSV string
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_string = csv_buffer.getvalue()
-    
-    # Print preview for debugging
-    print(f"Excel CSV Preview: {csv_string[:500]}...")
-    
-    return csv_string
+# Header layouts of the common statement sources. Only the statement structure is matched,
+# never brand names, since statements routinely mention other wallets in rows
+# (e.g. "ESEWA LOAD" on a bank statement); anything else goes to Groq.
+# Words may be split by spaces or, for PDF text lines, by commas, hence the [\s,]+ separators
+_SOURCE_SIGNATURES = {
+    "Khalti": re.compile(r'Transaction[\s,]+ID,[\s]*Transaction[\s,]+Type,[\s]*Transaction[\s,]+State', re.I),
+    "eSewa": re.compile(r'Statement[\s,]+Report.*Reference[\s,]+Code', re.I | re.S),
+    "Global IME": re.compile(r'Electronic[\s,]+Account[\s,]+Statement', re.I),
+}
 
-async def process_file(file: UploadFile) -> Dict:
-    """
-    Main function to process file and return CSV data
-    """
-    # Read file content
-    file_content = await file.read()
-    
-    # Detect format
-    file_format = detect_format(file)
-    
-    if file_format == "unsupported":
-        return {
-            "success": False,
-            "format": file_format,
-            "message": "Unsupported file format. Please upload PDF or Excel file.",
-            "data": None
-        }
-    
-    try:
-        # Process based on format
-        if file_format == "pdf":
-            csv_data = await process_pdf(file_content)
-        elif file_format == "excel":
-            csv_data = await process_excel(file_content, file.filename)
-        
-        # Use Groq to analyze the CSV data
-        system_prompt = """
-You are a financial data analysis expert. Your job is to determine the *source* of CSV transaction data files extracted from banks or financial platforms in Nepal. 
-
-You will receive a raw CSV preview as text. Based on its structure (column headers, formatting, terminology), identify which platform the data most likely belongs to.
-
-Common sources include (but are not limited to):
-- Khalti
-- eSewa
-- Global IME Bank
-
-You should identify patterns like:
-- Transaction formats
-- Common field names (e.g., Dr./Cr., Reference Code)
-- Keywords (e.g., Fonepay, Statement Report, MOS:NTC)
-- Column styles and header naming
-
-Respond ONLY with a valid JSON in the following format:
-```json
-{"source": "<detected source>"}
-```
-Do not add any explanation or additional data. If uncertain, guess the **most likely** source.
+def _match_source_signatures(csv_preview: str) -> List[str]:
+    """Return every source whose signature appears in the start of the preview."""
+    text = csv_preview[:4000]
+    return [source for source, pattern in _SOURCE_SIGNATURES.items() if pattern.search(text)]
 
----
+# Kept short: input tokens dominate Groq latency and cost
+_SOURCE_SYSTEM_PROMPT = """You identify the source of CSV transaction data extracted from Nepali bank or wallet statements.
+Known sources: Khalti, eSewa, Global IME. Other banks or platforms are possible.
+Hints: Khalti has Transaction ID/State columns and "Scan and Pay" rows; eSewa starts with "Statement Report" and has Reference Code, Dr., Cr. columns; Global IME has an "Electronic Account Statement" header and rows such as MOS:NTC or ASBA CHARGE.
+Respond ONLY with JSON: {"source": "<detected source>"}. If uncertain, give the most likely source.
+"""
 
+# Few-shot examples, only appended to the prompt when the local signatures were ambiguous
+_SOURCE_EXAMPLES = """
 Examples:
 
 ---
@@ -197,45 +108,189 @@ TXN,Date,Value,Date,Description,Remarks,Withdraw,Deposit,Balance
 ```json
 {"source": "Global IME"}
 ```
+"""
 
----
+# How much of a file is extracted when only the source-detection preview is needed
+PREVIEW_PAGES = 2
+PREVIEW_ROWS = 50
 
-Now, detect the source from the following CSV:
-```
-{{CSV_PREVIEW_INPUT_HERE}}
-```
-"""
+# PDFium is not thread-safe, and a preview and a full extraction can run side by side
+_PDFIUM_LOCK = threading.Lock()
+
+def _pdfium_page_text(doc: "pdfium.PdfDocument", index: int) -> str:
+    """Extract one page's text with PDFium (native code)."""
+    with _PDFIUM_LOCK:
+        page = doc[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+async def process_pdf(file_content: bytes, max_pages: Optional[int] = None) -> str:
+    """
+    Process PDF file and extract tables using pdfplumber.
+    `max_pages` limits extraction to the first pages (e.g. for a preview).
+    The parsing runs in a worker thread so the event loop stays free.
+    """
+    return await asyncio.to_thread(_pdf_to_csv, file_content, max_pages)
+
+def _pdf_to_csv(file_content: bytes, max_pages: Optional[int]) -> str:
+    # Rows go straight into the CSV buffer as each page is parsed
+    csv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer)
+    
+    # PDFium handle for the text fallback; only opened once a page without tables shows up
+    text_doc = None
+    
+    try:
+        with io.BytesIO(file_content) as f:
+            # Open PDF with pdfplumber (its table finder is kept for the table pages)
+            with pdfplumber.open(f) as pdf:
+                # Process each page
+                pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
+                for index, page in enumerate(pages):
+                    # Extract tables from the page
+                    tables = page.find_tables()
+                    for table in tables:
+                        csv_writer.writerows(table.extract())
+                    
+                    if not tables:
+                        # No tables found: take the page text from PDFium instead of
+                        # pdfplumber's pure-Python text layout
+                        if text_doc is None:
+                            with _PDFIUM_LOCK:
+                                text_doc = pdfium.PdfDocument(file_content)
+                        for line in _pdfium_page_text(text_doc, index).splitlines():
+                            # Basic parsing - customize based on your statement format
+                            parts = line.split()
+                            if len(parts) >= 4:  # Assuming transaction lines have at least 4 parts
+                                csv_writer.writerow(parts)
+                    
+                    # Release the page's cached chars/layout before moving to the next one
+                    page.close()
+    finally:
+        if text_doc is not None:
+            with _PDFIUM_LOCK:
+                text_doc.close()
+    
+    # Log preview of CSV for debugging
+    csv_data = csv_buffer.getvalue()
+    logger.debug("CSV Preview: %.500s...", csv_data)
+    
+    return csv_data
+
+async def process_excel(file_content: bytes, filename: str, max_rows: Optional[int] = None) -> str:
+    """
+    Process Excel file and convert to CSV string.
+    Rows of the first sheet go from calamine (Rust) straight into csv.writer, with no DataFrame in between.
+    `max_rows` limits extraction to the first rows (e.g. for a preview).
+    """
+    return await asyncio.to_thread(_excel_to_csv, file_content, filename, max_rows)
+
+def _excel_to_csv(file_content: bytes, filename: str, max_rows: Optional[int]) -> str:
+    logger.debug("Processing Excel file with calamine: %s", filename)
+    
+    with io.BytesIO(file_content) as f:
+        rows = CalamineWorkbook.from_filelike(f).get_sheet_by_index(0).to_python(nrows=max_rows)
+    
+    # Write the non-empty rows to CSV
+    csv_buffer = io.StringIO()
+    csv.writer(csv_buffer).writerows(row for row in rows if any(cell != "" for cell in row))
+    csv_string = csv_buffer.getvalue()
+    
+    # Log preview for debugging
+    logger.debug("Excel CSV Preview: %.500s...", csv_string)
+    
+    return csv_string
+
+async def _extract_csv(file_format: str, file_content: bytes, filename: str, preview: bool = False) -> str:
+    """Extract CSV text from a PDF or Excel file, or just its first pages/rows with `preview`."""
+    if file_format == "pdf":
+        return await process_pdf(file_content, max_pages=PREVIEW_PAGES if preview else None)
+    return await process_excel(file_content, filename, max_rows=PREVIEW_ROWS if preview else None)
+
+async def process_file(file: UploadFile, preview_only: bool = False) -> Dict:
+    """
+    Main function to process file and return CSV data.
+    With `preview_only`, only the first pages/rows are extracted: enough for source
+    detection, without parsing the rest of a long statement.
+    """
+    # Read file content
+    file_content = await file.read()
+    
+    # Detect format
+    file_format = detect_format(file)
+    
+    if file_format == "unsupported":
+        return {
+            "success": False,
+            "format": file_format,
+            "message": "Unsupported file format. Please upload PDF or Excel file.",
+            "data": None
+        }
+    
+    full_extraction = None
+    try:
+        # Source detection only looks at the first pages/rows. For a full upload the complete
+        # extraction runs in the background while that preview goes to Groq, so the parse and
+        # the API round-trip overlap instead of adding up
+        if not preview_only:
+            full_extraction = asyncio.create_task(_extract_csv(file_format, file_content, file.filename))
+        preview_data = await _extract_csv(file_format, file_content, file.filename, preview=True)
+        
+        # Common statement layouts are recognised locally; Groq is only asked when
+        # no signature or more than one matches
+        matches = _match_source_signatures(preview_data)
+        if len(matches) == 1:
+            source = matches[0]
+            csv_data = await full_extraction if full_extraction else preview_data
+            return {
+                "success": True,
+                "format": file_format,
+                "message": f"Successfully {'previewed' if preview_only else 'processed'} {file_format} file",
+                "data": csv_data,
+                "analysis": json.dumps({"source": source}),
+                "source": source
+            }
+        
+        # Use Groq to analyze the CSV data; the worked examples are only sent when several
+        # signatures matched, since that is the case they help disambiguate
+        system_prompt = _SOURCE_SYSTEM_PROMPT
+        if len(matches) > 1:
+            system_prompt += _SOURCE_EXAMPLES
         
         user_prompt = f"""Analyze this CSV data and tell me which bank or financial platform it's from:
         ```
-        {csv_data[:2000]}
+        {preview_data[:2000]}
         ```
         
-        Return your answer in JSON format: {{"source": "SOURCE_NAME", "confidence": "HIGH/MEDIUM/LOW"}}
+        Return your answer in JSON format: {{"source": "SOURCE_NAME"}}
         """
         
         # Call Groq API
         groq_response = await ask_groq(system_prompt, user_prompt)
-        print(f"\n----- GROQ ANALYSIS RESULT -----\n{groq_response}\n-------------------------------\n")
+        logger.debug("Groq source analysis result: %s", groq_response)
+        
+        csv_data = await full_extraction if full_extraction else preview_data
         
         try:
-            # Parse JSON from Groq
-            import json
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', groq_response)
-            if json_match:
-                analysis_data = json.loads(json_match.group(0))
-                source = analysis_data.get("source", "Unknown")
-            else:
-                source = "Unknown"
+            # Parse JSON from Groq; it usually answers with bare JSON, so try that before searching
+            try:
+                analysis_data = json.loads(groq_response)
+            except json.JSONDecodeError:
+                json_match = _JSON_OBJECT_RE.search(groq_response)
+                analysis_data = json.loads(json_match.group(0)) if json_match else {}
+            source = analysis_data.get("source", "Unknown")
         except Exception as e:
-            print(f"Error parsing Groq response: {e}")
+            logger.warning("Error parsing Groq response: %s", e)
             source = "Unknown"
         
         return {
             "success": True,
             "format": file_format,
-            "message": f"Successfully processed {file_format} file",
+            "message": f"Successfully {'previewed' if preview_only else 'processed'} {file_format} file",
             "data": csv_data,
             "analysis": groq_response,
             "source": source
@@ -247,4 +302,11 @@ Now, detect the source from the following CSV:
             "format": file_format,
             "message": f"Error processing file: {str(e)}",
             "data": None
-        }
\ No newline at end of file
+        }
+    finally:
+        # When the preview or Groq step failed first, stop waiting on the background
+        # extraction and collect its outcome so it never goes unobserved
+        if full_extraction is not None:
+            if not full_extraction.done():
+                full_extraction.cancel()
+            await asyncio.gather(full_extraction, return_exceptions=True)
\ No newline at end of file
@@ -1,10 +1,68 @@
 import aiohttp
-import json
-import os
+import asyncio
 import certifi
+import hashlib
+import orjson
 import ssl
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 from datetime import datetime
+from ..core.env import getenv
+from ..utils.cache import TTLCache
+from ..core.logging import logger
+
+# CA bundle parsed once, not per request
+_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+# Endpoint, default model and auth headers resolved once at import
+_API_KEY = getenv("GROQ_API_KEY")
+_API_ENDPOINT = getenv("GROQ_API_ENDPOINT", "https://api.groq.com/openai/v1/chat/completions")
+# Updated default model from mixtral-8x7b-32768 to llama3-70b-8192
+_DEFAULT_MODEL = getenv("GROQ_MODEL", "llama3-70b-8192")
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {_API_KEY}"
+}
+if not _API_KEY:
+    logger.warning("GROQ_API_KEY is not set; Groq calls will be rejected")
+
+# One pooled session for every Groq call, so keep-alive connections skip the TCP/TLS handshake.
+# Created lazily because a ClientSession has to be built inside the running event loop
+_session: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """Return the shared Groq session, creating it on first use (or after it was closed)."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            ssl=_SSL_CONTEXT,
+            limit=100,
+            limit_per_host=30,
+            keepalive_timeout=75
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+    return _session
+
+# Exact-match answers keyed by a hash of model, sampling settings and both prompts.
+# Only near-deterministic calls are cached; higher temperatures are meant to vary
+_response_cache = TTLCache(
+    maxsize=int(getenv("GROQ_CACHE_SIZE", "1024")),
+    ttl=float(getenv("GROQ_CACHE_TTL", "3600"))
+)
+_CACHEABLE_TEMPERATURE = 0.3
+
+def _response_cache_key(model: str, temperature: float, max_tokens: int, system_prompt: str, user_prompt: str) -> str:
+    raw = f"{model}|{temperature}|{max_tokens}|{system_prompt}|{user_prompt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+async def close_groq_session() -> None:
+    """Close the shared session; called on application shutdown."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
 
 async def ask_groq(
     system_prompt: str, 
@@ -26,58 +84,114 @@ async def ask_groq(
     Returns:
         The text response from Groq AI
     """
-    api_key = os.getenv("GROQ_API_KEY")
-    api_endpoint = os.getenv("GROQ_API_ENDPOINT", "https://api.groq.com/openai/v1/chat/completions")
-    
-    # Updated default model from mixtral-8x7b-32768 to llama3-70b-8192
-    ai_model = model or os.getenv("GROQ_MODEL", "llama3-70b-8192")
+    ai_model = model or _DEFAULT_MODEL
     
     # Add fallback models if the primary fails
     fallback_models = ["llama2-70b-4096", "claude-3-opus-20240229"]
     
-    # Add this debugging before the API call
-    if api_key:
-        print(f"Using API key: {api_key[:5]}...")
-    else:
-        print("WARNING: No API key found!")
-    
-    # Create SSL context with certifi certificates
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
+    cache_key = None
+    if temperature <= _CACHEABLE_TEMPERATURE:
+        cache_key = _response_cache_key(ai_model, temperature, max_tokens, system_prompt, user_prompt)
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
     try:
-        # Use the SSL context in the ClientSession
-        conn = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=conn) as session:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            }
+        session = _get_session()
+        payload = {
+            "model": ai_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        logger.debug("Calling Groq API with model: %s", ai_model)
+        # Body encoded with orjson; Content-Type is already in the base headers
+        async with session.post(_API_ENDPOINT, data=orjson.dumps(payload), headers=_BASE_HEADERS) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error("Groq API Error (%s): %s", response.status, error_text)
+                # Return more detailed error information
+                return f"Error calling Groq API ({response.status}): {error_text[:500]}"
             
-            payload = {
-                "model": ai_model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
+            result = orjson.loads(await response.read())
+            content = result["choices"][0]["message"]["content"]
+            # Error strings are returned above and never cached
+            if cache_key is not None:
+                _response_cache.set(cache_key, content)
+            return content
             
-            print(f"Calling Groq API with model: {ai_model}")
-            async with session.post(api_endpoint, json=payload, headers=headers) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    print(f"Groq API Error ({response.status}): {error_text}")
-                    # Return more detailed error information
-                    return f"Error calling Groq API ({response.status}): {error_text[:500]}"
-                
-                result = await response.json()
-                return result["choices"][0]["message"]["content"]
-                
     except Exception as e:
-        print(f"Error in ask_groq: {str(e)}")
+        logger.error("Error in ask_groq: %s", e)
         return f"Error: {str(e)}"
 
+async def stream_groq(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.2,
+    max_tokens: int = 1000,
+    model: str = None
+) -> AsyncIterator[str]:
+    """
+    Stream a Groq completion, yielding text deltas as the server sends them.
+    Uses the chat completions SSE mode, so the first tokens arrive long before the full answer.
+    Raises RuntimeError when the API answers with an error status.
+    """
+    ai_model = model or _DEFAULT_MODEL
+    
+    payload = {
+        "model": ai_model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True
+    }
+    
+    async with _get_session().post(_API_ENDPOINT, data=orjson.dumps(payload), headers=_BASE_HEADERS) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise RuntimeError(f"Error calling Groq API ({response.status}): {error_text[:500]}")
+        
+        # One "data: {...}" frame per line, blank lines in between, "data: [DONE]" at the end
+        async for line in response.content:
+            line = line.strip()
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
+                break
+            delta = orjson.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+# Upper bound on Groq calls in flight from batch helpers, to stay inside the rate limits
+_GROQ_SEMAPHORE = asyncio.Semaphore(int(getenv("GROQ_CONCURRENCY", "8")))
+
+async def ask_groq_batch(
+    prompts: List[Tuple[str, str]],
+    temperature: float = 0.2,
+    max_tokens: int = 1000,
+    model: str = None
+) -> List[Union[str, BaseException]]:
+    """
+    Run ask_groq for several (system_prompt, user_prompt) pairs concurrently.
+    At most GROQ_CONCURRENCY requests are in flight; results come back in input order,
+    with any raised exception in place of its answer.
+    """
+    async def _one(system_prompt: str, user_prompt: str) -> str:
+        async with _GROQ_SEMAPHORE:
+            return await ask_groq(system_prompt, user_prompt, temperature, max_tokens, model)
+    
+    return await asyncio.gather(
+        *(_one(system_prompt, user_prompt) for system_prompt, user_prompt in prompts),
+        return_exceptions=True
+    )
 
 # Add a class wrapper for backward compatibility
 class GroqService:
@@ -113,6 +227,14 @@ class GroqService:
             
         return result
     
+    async def process_chat_batch(self, user_inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process several chat messages concurrently, bounded like ask_groq_batch"""
+        async def _one(user_input: Dict[str, Any]) -> Dict[str, Any]:
+            async with _GROQ_SEMAPHORE:
+                return await self.process_chat(user_input)
+        
+        return await asyncio.gather(*(_one(user_input) for user_input in user_inputs))
+    
     def _save_result(self, data: dict) -> None:
         """Save chat results to file"""
         from uuid import uuid4
@@ -124,7 +246,7 @@ class GroqService:
         }
         
         file_path = self.output_dir / f"{result['id']}.json"
-        with open(file_path, "w") as f:
-            json.dump(result, f, indent=2)
+        with open(file_path, "wb") as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
 
 #
\ No newline at end of file
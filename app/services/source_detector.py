@@ -105,7 +105,7 @@ async def detect_source(csv_data: str) -> Dict[str, str]:
         async with aiohttp.ClientSession() as session:
             headers = {
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {settings.GROK_API_KEY}"
+                "Authorization": f"Bearer {settings.GROQ_API_KEY}"
             }
             
             payload = {
@@ -117,7 +117,7 @@ async def detect_source(csv_data: str) -> Dict[str, str]:
                 "max_tokens": 100    # Short response limit
             }
             
-            api_url = settings.GROK_API_ENDPOINT
+            api_url = settings.GROQ_API_ENDPOINT
             async with session.post(api_url, json=payload, headers=headers) as response:
                 if response.status != 200:
                     error_text = await response.text()
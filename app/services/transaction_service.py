@@ -1,23 +1,37 @@
+from sqlalchemy import and_, delete, insert, lambda_stmt, or_, select, tuple_, update
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime, time
 from ..models.transaction import Transaction
+from ..models.user import User
+from ..core.database import SessionLocal
 from ..schemas.transaction import TransactionCreate
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple, Union
 import uuid
 import pandas as pd
 import json
+import orjson
 import re
 from io import StringIO
-from app.services.category_detector import detect_category_for_transaction
+from app.services.category_detector import detect_categories, detect_category_for_transaction
+from app.utils.helpers import uuid7
+from app.core.logging import logger
 
-def create_transaction(db: Session, transaction_data: TransactionCreate, user_id: uuid.UUID) -> Transaction:
-    """Create a new transaction record for a user"""
+def create_transaction(
+    db: Session,
+    transaction_data: TransactionCreate,
+    user_id: uuid.UUID,
+    commit: bool = True
+) -> Transaction:
+    """
+    Create a new transaction record for a user.
+    Callers adding many rows can pass commit=False and commit once at the end.
+    """
     db_transaction = Transaction(
-        id=uuid.uuid4(),
+        id=uuid7(),
         user_id=user_id,
         transaction_id=transaction_data.transaction_id,
-        date=transaction_data.date,
-        time=transaction_data.time,
+        transaction_date=transaction_data.date,
+        transaction_time=transaction_data.time,
         description=transaction_data.description,
         dr=transaction_data.dr,
         cr=transaction_data.cr,
@@ -27,37 +41,191 @@ def create_transaction(db: Session, transaction_data: TransactionCreate, user_id
     )
     
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    if commit:
+        db.commit()
+        db.refresh(db_transaction)
     return db_transaction
 
-def get_transactions(db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Transaction]:
-    """Get all transactions for a user with pagination"""
-    return db.query(Transaction).filter(
-        Transaction.user_id == user_id
-    ).order_by(Transaction.date.desc(), Transaction.time.desc()).offset(skip).limit(limit).all()
+# Newest first; id breaks ties so keyset pages never skip or repeat rows (matches ix_tx_user_date)
+TRANSACTION_ORDER = (
+    Transaction.transaction_date.desc(),
+    Transaction.transaction_time.desc(),
+    Transaction.id.desc(),
+)
+
+# Columns of the Transaction response schema, labelled with its field names,
+# so the list endpoint returns the same shape as the single-transaction endpoints
+TRANSACTION_FIELDS = (
+    Transaction.transaction_id,
+    Transaction.transaction_date.label("date"),
+    Transaction.transaction_time.label("time"),
+    Transaction.description,
+    Transaction.dr,
+    Transaction.cr,
+    Transaction.source,
+    Transaction.balance,
+    Transaction.raw_data,
+    Transaction.id,
+    Transaction.user_id,
+    Transaction.created_at,
+)
+
+def get_transactions(
+    db: Session,
+    user_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[date, time, uuid.UUID]] = None
+) -> List[Dict]:
+    """
+    Get a page of a user's transactions as plain dicts shaped like the Transaction schema, newest first.
+    Skips ORM object construction; the rows are serialized straight to JSON.
+    `after` is the (date, time, id) of the last row already seen; when given, the
+    query seeks past it on the index instead of OFFSET-scanning earlier rows.
+    """
+    stmt = (
+        select(*TRANSACTION_FIELDS)
+        .where(Transaction.user_id == user_id)
+        .order_by(*TRANSACTION_ORDER)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(Transaction.transaction_date, Transaction.transaction_time, Transaction.id) < tuple_(*after)
+        )
+    elif skip:
+        stmt = stmt.offset(skip)
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+def iter_transactions_ndjson(user_id: uuid.UUID, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Yield every transaction for a user as newline-delimited JSON, newest first.
+    Rows are fetched `batch_size` at a time through a server-side cursor and never
+    materialized as ORM objects. Opens its own session because the response body
+    is produced after the request's dependencies have been torn down.
+    """
+    db = SessionLocal()
+    try:
+        stmt = (
+            select(*TRANSACTION_FIELDS)
+            .where(Transaction.user_id == user_id)
+            .order_by(*TRANSACTION_ORDER)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in db.execute(stmt):
+            yield orjson.dumps(row._asdict()) + b"\n"
+    finally:
+        db.close()
 
 def get_transaction_by_id(db: Session, transaction_id: uuid.UUID, user_id: uuid.UUID) -> Optional[Transaction]:
     """Get a specific transaction by ID for a user"""
-    return db.query(Transaction).filter(
+    # lambda_stmt caches the constructed statement; the closure variables become bound parameters
+    stmt = lambda_stmt(lambda: select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == user_id
-    ).first()
+    ))
+    return db.execute(stmt).scalars().first()
+
+def update_user_transaction(
+    db: Session, transaction_id: uuid.UUID, user_id: uuid.UUID, values: Dict
+) -> Optional[Transaction]:
+    """
+    Apply a partial update to a user's transaction with a single UPDATE ... RETURNING.
+    Returns None if the transaction doesn't exist or belongs to someone else.
+    """
+    if not values:
+        return get_transaction_by_id(db, transaction_id, user_id)
+    
+    transaction = db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id, Transaction.user_id == user_id)
+        .values(**values)
+        .returning(Transaction)
+    ).scalar_one_or_none()
+    db.commit()
+    return transaction
+
+def delete_user_transaction(db: Session, transaction_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """
+    Delete a user's transaction with a single DELETE; ownership is part of the predicate.
+    Returns False if nothing matched.
+    """
+    result = db.execute(
+        delete(Transaction).where(Transaction.id == transaction_id, Transaction.user_id == user_id)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+def get_transaction_with_requester(
+    db: Session, transaction_id: uuid.UUID, requesting_user_id: uuid.UUID
+) -> Optional[Tuple[Optional[Transaction], bool]]:
+    """
+    Load a transaction the requesting user may see, together with their admin flag, in one query.
+    Ownership is part of the join condition, so another user's row is never read unless
+    the requester is an admin.
+    Returns None if the user doesn't exist, or (None, is_admin) if there is no visible transaction.
+    """
+    row = db.execute(lambda_stmt(
+        lambda: select(Transaction, User.is_admin)
+        .select_from(User)
+        .outerjoin(Transaction, and_(
+            Transaction.id == transaction_id,
+            or_(Transaction.user_id == User.id, User.is_admin.is_(True))
+        ))
+        .where(User.id == requesting_user_id)
+    )).first()
+    if row is None:
+        return None
+    return row[0], bool(row[1])
+
+def _batch_row(transaction_data: Dict, user_id: uuid.UUID) -> Optional[Dict]:
+    """Column values for one batch row, or None when its amounts don't parse."""
+    try:
+        return {
+            "id": uuid7(),
+            "user_id": user_id,
+            "transaction_id": transaction_data.get("transaction_id"),
+            "transaction_date": transaction_data.get("transaction_date"),
+            "transaction_time": transaction_data.get("transaction_time"),
+            "description": transaction_data.get("description"),
+            "dr": float(transaction_data.get("dr", 0)),
+            "cr": float(transaction_data.get("cr", 0)),
+            "source": transaction_data.get("source", "file_upload"),
+            "balance": float(transaction_data.get("balance", 0)),
+            "raw_data": transaction_data.get("raw_data"),
+        }
+    except (TypeError, ValueError) as e:
+        logger.debug("Error creating transaction: %s", e)
+        return None
 
-def create_transactions_batch(db: Session, transactions_data: List[Dict], user_id: uuid.UUID) -> List[Transaction]:
+def create_transactions_batch(
+    db: Session,
+    transactions_data: List[Dict],
+    user_id: uuid.UUID,
+    use_orm: bool = False
+) -> Union[List[Dict], List[Transaction]]:
     """
-    Create multiple transactions at once from processed file data
+    Create multiple transactions at once from processed file data.
+    By default the rows go out as one executemany INSERT, without building ORM objects,
+    and the inserted column dicts are returned. Pass use_orm=True for Transaction instances.
     """
+    if not use_orm:
+        rows = [row for row in (_batch_row(data, user_id) for data in transactions_data) if row is not None]
+        if len(rows) < len(transactions_data):
+            logger.warning(f"Dropped {len(transactions_data) - len(rows)} invalid transactions from batch")
+        if rows:
+            db.execute(insert(Transaction), rows)
+            db.commit()
+        return rows
+    
     db_transactions = []
+    bad_row_count = 0
     
     for transaction_data in transactions_data:
         try:
-            # Convert string date/time to appropriate objects if needed
-            from datetime import datetime
-            
             # Create transaction object
             db_transaction = Transaction(
-                id=uuid.uuid4(),
+                id=uuid7(),
                 user_id=user_id,
                 transaction_id=transaction_data.get("transaction_id"),
                 transaction_date=transaction_data.get("transaction_date"),
@@ -73,10 +241,14 @@ def create_transactions_batch(db: Session, transactions_data: List[Dict], user_i
             db_transactions.append(db_transaction)
             
         except Exception as e:
-            print(f"Error creating transaction: {str(e)}")
+            bad_row_count += 1
+            logger.debug("Error creating transaction: %s", e)
             # Continue with other transactions
             continue
     
+    if bad_row_count:
+        logger.warning(f"Dropped {bad_row_count} invalid transactions from batch")
+    
     # Bulk insert all transactions
     if db_transactions:
         db.add_all(db_transactions)
@@ -84,6 +256,67 @@ def create_transactions_batch(db: Session, transactions_data: List[Dict], user_i
         
     return db_transactions
 
+# Column-role patterns, compiled once; each matches a header case-insensitively by substring
+_GENERIC_ROLE_PATTERNS = {
+    "date": re.compile(r"date", re.I),
+    "description": re.compile(r"description|narration|particulars", re.I),
+    "debit": re.compile(r"dr|debit|withdraw", re.I),
+    "credit": re.compile(r"cr|credit|deposit", re.I),
+    "balance": re.compile(r"balance", re.I),
+    "reference": re.compile(r"ref|transaction id", re.I),
+}
+_SOURCE_ROLE_PATTERNS = {
+    "esewa": {
+        "date": re.compile(r"date time", re.I),
+        "description": re.compile(r"description", re.I),
+        "debit": re.compile(r"dr\.", re.I),
+        "credit": re.compile(r"cr\.", re.I),
+        "balance": re.compile(r"balance", re.I),
+        "reference": re.compile(r"reference code", re.I),
+    },
+    "khalti": {
+        "date": re.compile(r"transaction date", re.I),
+        "time": re.compile(r"transaction time", re.I),
+        "description": re.compile(r"description", re.I),
+        "debit": re.compile(r"amount\(-\)", re.I),
+        "credit": re.compile(r"amount\(\+\)", re.I),
+        "balance": re.compile(r"balance", re.I),
+        "reference": re.compile(r"transaction id", re.I),
+    },
+}
+_CSV_ROLE_PATTERNS = {
+    **_GENERIC_ROLE_PATTERNS,
+    "description": re.compile(r"description|narration|particulars|details", re.I),
+    "debit": re.compile(r"dr|debit|withdraw|amount\(-\)", re.I),
+    "credit": re.compile(r"cr|credit|deposit|amount\(\+\)", re.I),
+}
+
+def _detect_columns(columns, patterns: Dict[str, "re.Pattern"]) -> Dict[str, Optional[str]]:
+    """Map each role to the first column whose header matches it, in one pass over the headers."""
+    found = {role: None for role in patterns}
+    for col in columns:
+        for role, pattern in patterns.items():
+            if found[role] is None and pattern.search(str(col)):
+                found[role] = col
+    return found
+
+def _find_header_offset(csv_data: str) -> int:
+    """
+    Return the character offset of the transaction table header line, or -1.
+    Scans line by line in place, without splitting the whole document.
+    """
+    start, end_of_data = 0, len(csv_data)
+    while start < end_of_data:
+        end = csv_data.find('\n', start)
+        if end == -1:
+            end = end_of_data
+        line_lower = csv_data[start:end].lower()
+        if (('date' in line_lower and ('description' in line_lower or 'narration' in line_lower)) or
+            ('txn' in line_lower) or ('transaction' in line_lower)):
+            return start
+        start = end + 1
+    return -1
+
 async def csv_to_transactions(
     csv_data: str, 
     user_id: uuid.UUID, 
@@ -94,37 +327,21 @@ async def csv_to_transactions(
     Convert CSV data to Transaction objects, including category detection.
     """
     transactions = []
+    bad_row_count = 0
     
     # Find the actual header row (bank statements often have metadata before headers)
-    csv_lines = csv_data.splitlines()
-    header_row = -1
-    
-    # Look for common transaction table headers
-    for idx, line in enumerate(csv_lines):
-        line_lower = line.lower()
-        if (('date' in line_lower and ('description' in line_lower or 'narration' in line_lower)) or
-            ('txn' in line_lower) or  # Transaction
-            ('transaction' in line_lower)):
-            header_row = idx
-            break
+    header_offset = _find_header_offset(csv_data)
     
-    if header_row == -1:
-        print("Could not find transaction header row")
+    if header_offset == -1:
+        logger.warning("Could not find transaction header row")
         return []
     
-    # Extract column headers and transaction data
-    headers = csv_lines[header_row].split(',')
-    transaction_rows = csv_lines[header_row+1:]
-    
-    # Create a new CSV with just the header and transaction data
-    transaction_csv = '\n'.join([csv_lines[header_row]] + transaction_rows)
-    
     try:
         # Parse CSV data with pandas
         df = pd.read_csv(
-            StringIO(transaction_csv), 
+            StringIO(csv_data[header_offset:]), 
             sep=',',
-            engine='python',  # More flexible parsing engine
+            engine='c',  # Native parser; still skips ragged rows below
             on_bad_lines='skip',  # Skip problematic lines
             dtype=str  # Read all data as strings initially to avoid numeric parsing issues
         )
@@ -133,23 +350,10 @@ async def csv_to_transactions(
         df = df.dropna(how='all')
         
         # Find the relevant columns for transaction data
-        date_col = next((col for col in df.columns 
-                        if any(term in col.lower() for term in ['date', 'txn date', 'transaction date', 'value date'])), None)
-        
-        desc_col = next((col for col in df.columns 
-                        if any(term in col.lower() for term in ['description', 'narration', 'particulars', 'details'])), None)
-        
-        debit_col = next((col for col in df.columns 
-                        if any(term in col.lower() for term in ['dr', 'debit', 'withdrawal', 'amount(-)', 'withdraw'])), None)
-        
-        credit_col = next((col for col in df.columns 
-                          if any(term in col.lower() for term in ['cr', 'credit', 'deposit', 'amount(+)'])), None)
-        
-        balance_col = next((col for col in df.columns 
-                           if any(term in col.lower() for term in ['balance', 'closing balance'])), None)
-        
-        ref_col = next((col for col in df.columns 
-                       if any(term in col.lower() for term in ['reference', 'ref', 'transaction id'])), None)
+        columns = _detect_columns(df.columns, _CSV_ROLE_PATTERNS)
+        date_col, desc_col = columns["date"], columns["description"]
+        debit_col, credit_col = columns["debit"], columns["credit"]
+        balance_col, ref_col = columns["balance"], columns["reference"]
         
         # Process each row
         for idx, row in df.iterrows():
@@ -193,7 +397,7 @@ async def csv_to_transactions(
                             if dr_clean:
                                 dr_amount = float(dr_clean)
                         except ValueError:
-                            print(f"Could not convert debit value: {dr_str}")
+                            logger.debug(f"Could not convert debit value: {dr_str}")
                 
                 # Extract credit amount (cr)
                 cr_amount = 0.0
@@ -220,7 +424,7 @@ async def csv_to_transactions(
                 
                 # Create Transaction object
                 transaction = Transaction(
-                    id=uuid.uuid4(),
+                    id=uuid7(),
                     user_id=user_id,
                     transaction_id=transaction_id,
                     transaction_date=transaction_date,
@@ -237,101 +441,110 @@ async def csv_to_transactions(
                 transactions.append(transaction)
                 
             except Exception as e:
-                print(f"Error processing row {idx}: {str(e)}")
+                bad_row_count += 1
+                logger.debug(f"Error processing row {idx}: {str(e)}")
                 continue
         
+        if bad_row_count:
+            logger.warning(f"Dropped {bad_row_count} unparseable rows from {filename}")
         return transactions
         
     except Exception as e:
-        print(f"Error processing CSV: {str(e)}")
+        logger.error(f"Error processing CSV: {str(e)}")
         return []
 
-def is_valid_transaction(row, date_col, debit_col, credit_col, desc_col=None):
-    """
-    Determines if a row represents a valid transaction by checking:
-    1. It has a proper date
-    2. It has either a debit or credit amount (not both empty/zero)
-    3. It's not a summary row, total, or metadata
-    """
-    # Skip rows that appear to be summaries, totals, or metadata
-    if desc_col and pd.notna(row[desc_col]):
-        desc_lower = str(row[desc_col]).lower()
-        # Skip summary rows and metadata
-        if any(term in desc_lower for term in [
-            'total', 'subtotal', 'opening balance', 'closing balance', 
-            'sum', 'average', 'balance b/f', 'balance c/f',
-            'statement', 'summary', 'period end', 'period start'
-        ]):
-            return False
-    
-    # For any column, check if it contains summary indicators
-    for col_name, value in row.items():
-        if pd.notna(value):
-            str_val = str(value).lower()
-            if any(term in str_val for term in [
-                'total', 'balance b/f', 'opening', 'closing', 
-                'statement period', 'summary'
-            ]):
-                return False
-    
-    # Check if it has a valid date
-    has_date = date_col is not None and pd.notna(row[date_col])
-    
-    # Check if it has either a debit or credit amount
-    has_amount = False
-    if debit_col and pd.notna(row[debit_col]) and str(row[debit_col]).strip() not in ['', '-', '0', '0.0']:
-        has_amount = True
-    elif credit_col and pd.notna(row[credit_col]) and str(row[credit_col]).strip() not in ['', '-', '0', '0.0']:
-        has_amount = True
-    
-    # Special handling for particular sources
-    if 'Reference Code' in row and str(row['Reference Code']).lower() in ['pending', 'complete', 'canceled', 'time out']:
-        # Only status value, not a transaction
-        if not has_amount:
-            return False
-    
-    # Must have both a date and a non-zero amount to be a valid transaction
-    return has_date and has_amount
+# Rows parsed, categorized and inserted per batch during uploads
+UPLOAD_CHUNK_ROWS = 10_000
+
+STANDARD_COLUMNS = [
+    "transaction_id", "transaction_date", "transaction_time",
+    "description", "dr", "cr", "balance", "source", "raw_data"
+]
+
+# Rows whose description mentions these are statement summaries, not transactions
+_DESCRIPTION_SKIP_TERMS = [
+    'total', 'subtotal', 'opening balance', 'closing balance',
+    'sum', 'average', 'balance b/f', 'balance c/f',
+    'statement', 'summary', 'period end', 'period start',
+    'opening', 'closing', 'beginning', 'ending'
+]
+# Rows with any cell mentioning these are summaries/metadata
+_CELL_SKIP_TERMS = [
+    'total', 'balance b/f', 'opening', 'closing',
+    'statement period', 'summary'
+]
+_HEADER_VALUES = ['date', 'transaction date', 'txn date']
+_EMPTY_AMOUNTS = ['', '-', 'nan', 'NaN']
+
+def _parse_amounts(values: pd.Series) -> pd.Series:
+    """Strip thousands separators/currency symbols and convert to float (0.0 when unparseable)."""
+    text = values.fillna('').astype(str).str.strip()
+    cleaned = text.str.replace(',', '', regex=False).str.replace(r'[^\d.]', '', regex=True)
+    amounts = pd.to_numeric(cleaned, errors='coerce').fillna(0.0)
+    return amounts.where(~text.isin(_EMPTY_AMOUNTS), 0.0)
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Parse each cell independently, falling back to explicit day-first formats."""
+    text = values.fillna('').astype(str).str.strip()
+    parsed = pd.to_datetime(text, format="mixed", errors="coerce")
+    for fmt in ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y']:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text[missing], format=fmt, errors="coerce"))
+    return parsed
 
 async def process_and_save_transactions(csv_data: str, user_id: uuid.UUID, source: str, db: Session) -> Dict:
     """
     Process CSV data, convert to transactions, and save to database
     """
     try:
-        # Step 1: Convert to standard format 
-        std_df = convert_to_standard_format(csv_data, source)
-        
-        if std_df.empty:
-            return {
-                "success": False,
-                "message": "No valid transactions found in file",
-                "count": 0
-            }
+        count = 0
+        total_debits = total_credits = 0.0
+        start_date = end_date = None
         
-        # Step 2: Convert to Transaction objects with categories
-        transactions = await standard_format_to_transactions(std_df, user_id)
+        # Parse, categorize and insert one chunk at a time so memory stays flat
+        for std_df in iter_standard_format(csv_data, source):
+            # Convert to transaction rows with categories
+            records = await standard_format_to_records(std_df, user_id)
+            if not records:
+                continue
+            
+            # Save as one executemany INSERT (no unit-of-work flush)
+            db.execute(insert(Transaction), records)
+            
+            # Running totals, computed from the parsed frame (vectorized)
+            count += len(records)
+            total_debits += float(std_df["dr"].sum())
+            total_credits += float(std_df["cr"].sum())
+            chunk_start, chunk_end = std_df["transaction_date"].min(), std_df["transaction_date"].max()
+            start_date = chunk_start if start_date is None else min(start_date, chunk_start)
+            end_date = chunk_end if end_date is None else max(end_date, chunk_end)
         
-        if not transactions:
+        if not count:
             return {
                 "success": False,
                 "message": "No valid financial transactions found in file",
                 "count": 0
             }
         
-        # Step 3: Save to database
-        db.add_all(transactions)
+        # One commit, so a failed upload never leaves a partial statement behind
         db.commit()
         
         return {
             "success": True,
-            "message": f"Successfully saved {len(transactions)} transactions",
-            "count": len(transactions),
-            "source": source
+            "message": f"Successfully saved {count} transactions",
+            "count": count,
+            "source": source,
+            "total_debits": total_debits,
+            "total_credits": total_credits,
+            "start_date": start_date,
+            "end_date": end_date
         }
         
     except Exception as e:
         db.rollback()
-        print(f"Error processing transactions: {str(e)}")
+        logger.error(f"Error processing transactions: {str(e)}")
         return {
             "success": False,
             "message": f"Error: {str(e)}",
@@ -350,275 +563,157 @@ def convert_to_standard_format(raw_csv: str, source: str) -> pd.DataFrame:
     Returns:
         Standardized pandas DataFrame with consistent column names
     """
-    # Find the header row
-    csv_lines = raw_csv.splitlines()
-    header_row = -1
-    
-    # Detect header row
-    for idx, line in enumerate(csv_lines):
-        line_lower = line.lower()
-        if (('date' in line_lower and ('description' in line_lower or 'narration' in line_lower)) or
-            ('txn' in line_lower) or ('transaction' in line_lower)):
-            header_row = idx
-            break
-    
-    if header_row == -1:
-        print("Could not find transaction header row")
-        # Create empty DataFrame with standard columns
-        return pd.DataFrame(columns=[
-            "transaction_id", "transaction_date", "transaction_time", 
-            "description", "dr", "cr", "balance", "source", "raw_data"
-        ])
-    
-    # Create a CSV with just the transaction data
-    transaction_csv = '\n'.join([csv_lines[header_row]] + csv_lines[header_row+1:])
-    
     try:
-        # Parse with pandas
-        df = pd.read_csv(
-            StringIO(transaction_csv), 
-            sep=',',
-            engine='python',
-            on_bad_lines='skip',
-            dtype=str
-        )
-        
-        # Clean data
-        df = df.dropna(how='all')
-        
-        # Find columns based on source
-        if source.lower() == "esewa":
-            date_col = next((col for col in df.columns if 'date time' in col.lower()), None)
-            desc_col = next((col for col in df.columns if 'description' in col.lower()), None)
-            debit_col = next((col for col in df.columns if 'dr.' in col.lower()), None)
-            credit_col = next((col for col in df.columns if 'cr.' in col.lower()), None)
-            balance_col = next((col for col in df.columns if 'balance' in col.lower()), None)
-            ref_col = next((col for col in df.columns if 'reference code' in col.lower()), None)
-        
-        elif source.lower() == "khalti":
-            date_col = next((col for col in df.columns if 'transaction date' in col.lower()), None)
-            time_col = next((col for col in df.columns if 'transaction time' in col.lower()), None)
-            desc_col = next((col for col in df.columns if 'description' in col.lower()), None)
-            debit_col = next((col for col in df.columns if 'amount(-)' in col.lower()), None)
-            credit_col = next((col for col in df.columns if 'amount(+)' in col.lower()), None)
-            balance_col = next((col for col in df.columns if 'balance' in col.lower()), None)
-            ref_col = next((col for col in df.columns if 'transaction id' in col.lower()), None)
-            
-        else:
-            # Generic mapping
-            date_col = next((col for col in df.columns 
-                           if any(term in col.lower() for term in ['date', 'txn date', 'transaction date'])), None)
-            desc_col = next((col for col in df.columns 
-                           if any(term in col.lower() for term in ['description', 'narration', 'particulars'])), None)
-            debit_col = next((col for col in df.columns 
-                            if any(term in col.lower() for term in ['dr', 'debit', 'withdrawal', 'withdraw'])), None)
-            credit_col = next((col for col in df.columns 
-                             if any(term in col.lower() for term in ['cr', 'credit', 'deposit'])), None)
-            balance_col = next((col for col in df.columns 
-                              if 'balance' in col.lower()), None)
-            ref_col = next((col for col in df.columns 
-                          if any(term in col.lower() for term in ['reference', 'ref', 'transaction id'])), None)
-        
-        # Create standardized DataFrame
-        standard_data = []
-        
-        # Process rows
-        for _, row in df.iterrows():
-            # Additional checks for non-transaction rows
-            
-            # 1. Skip rows with too many NaN values (likely headers or separators)
-            if row.isna().sum() > len(row) * 0.7:  # If more than 70% of fields are empty
-                continue
-                
-            # 2. Skip rows that appear to be duplicated headers
-            if date_col and pd.notna(row[date_col]) and any(
-                str(row[date_col]).lower() == header.lower() for header in ['date', 'transaction date', 'txn date']
-            ):
-                continue
-            
-            # 3. Use enhanced is_valid_transaction with description column
-            if not is_valid_transaction(row, date_col, debit_col, credit_col, desc_col):
-                continue
-            
-            # 4. Skip if both debit and credit are zero or empty (informational rows)
-            dr_amount = 0.0
-            cr_amount = 0.0
-            
-            if debit_col and pd.notna(row[debit_col]):
-                dr_str = str(row[debit_col])
-                if dr_str and dr_str.strip() and dr_str.strip() not in ['-', 'nan', 'NaN']:
-                    try:
-                        dr_clean = re.sub(r'[^\d.]', '', dr_str.replace(',', ''))
-                        if dr_clean:
-                            dr_amount = float(dr_clean)
-                    except:
-                        pass
-            
-            if credit_col and pd.notna(row[credit_col]):
-                cr_str = str(row[credit_col])
-                if cr_str and cr_str.strip() and cr_str.strip() not in ['-', 'nan', 'NaN']:
-                    try:
-                        cr_clean = re.sub(r'[^\d.]', '', cr_str.replace(',', ''))
-                        if cr_clean:
-                            cr_amount = float(cr_clean)
-                    except:
-                        pass
-            
-            if dr_amount == 0.0 and cr_amount == 0.0:
-                continue
-            
-            # 5. Get description for further filtering
-            description = str(row[desc_col]) if desc_col and pd.notna(row[desc_col]) else ""
-            
-            # 6. Skip rows with descriptions that indicate they're not transactions
-            if any(term in description.lower() for term in [
-                'total', 'balance b/f', 'balance c/f', 'opening', 'closing',
-                'statement generated', 'beginning', 'ending', 'subtotal'
-            ]):
-                continue
-                
-            # Now extract all the transaction fields as before...
-            
-            # 1. Extract transaction_date and transaction_time
-            transaction_date = datetime.now().date() 
-            transaction_time = datetime.now().time()
-            
-            if date_col and pd.notna(row[date_col]):
-                date_str = str(row[date_col]).strip()
-                try:
-                    # Handle datetime field (eSewa)
-                    if ":" in date_str:
-                        dt = pd.to_datetime(date_str)
-                        transaction_date = dt.date()
-                        transaction_time = dt.time()
-                    else:
-                        # Try multiple formats
-                        for fmt in [None, '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y']:
-                            try:
-                                if fmt:
-                                    transaction_date = datetime.strptime(date_str, fmt).date()
-                                else:
-                                    transaction_date = pd.to_datetime(date_str).date()
-                                break
-                            except:
-                                continue
-                except:
-                    pass
-            
-            # 2. description
-            description = str(row[desc_col]) if desc_col and pd.notna(row[desc_col]) else ""
-            
-            # 3. dr
-            dr = 0.0
-            if debit_col and pd.notna(row[debit_col]):
-                dr_str = str(row[debit_col])
-                if dr_str and dr_str.strip() and dr_str.strip() not in ['-', 'nan', 'NaN']:
-                    try:
-                        dr_clean = re.sub(r'[^\d.]', '', dr_str.replace(',', ''))
-                        if dr_clean:
-                            dr = float(dr_clean)
-                    except:
-                        pass
-            
-            # 4. cr
-            cr = 0.0
-            if credit_col and pd.notna(row[credit_col]):
-                cr_str = str(row[credit_col])
-                if cr_str and cr_str.strip() and cr_str.strip() not in ['-', 'nan', 'NaN']:
-                    try:
-                        cr_clean = re.sub(r'[^\d.]', '', cr_str.replace(',', ''))
-                        if cr_clean:
-                            cr = float(cr_clean)
-                    except:
-                        pass
-            
-            # Skip if no transaction amount
-            if dr == 0.0 and cr == 0.0:
-                continue
-            
-            # 5. balance
-            balance = 0.0
-            if balance_col and pd.notna(row[balance_col]):
-                bal_str = str(row[balance_col])
-                if bal_str and bal_str.strip():
-                    try:
-                        bal_clean = re.sub(r'[^\d.]', '', bal_str.replace(',', ''))
-                        if bal_clean:
-                            balance = float(bal_clean)
-                    except:
-                        pass
-            
-            # 6. transaction_id
-            transaction_id = None
-            if ref_col and pd.notna(row[ref_col]):
-                transaction_id = str(row[ref_col]).strip()
-                # Skip status indicators with no amounts
-                if transaction_id.lower() in ['pending', 'complete', 'canceled', 'time out'] and dr == 0.0 and cr == 0.0:
-                    continue
-            
-            # Add to standardized data list
-            standard_data.append({
-                "transaction_id": transaction_id,
-                "transaction_date": transaction_date,
-                "transaction_time": transaction_time, 
-                "description": description,
-                "dr": dr,
-                "cr": cr,
-                "balance": balance,
-                "source": source,
-                "raw_data": json.dumps(row.to_dict())
-            })
-        
-        # Create DataFrame from records
-        standard_df = pd.DataFrame(standard_data)
-        return standard_df
+        frames = list(iter_standard_format(raw_csv, source))
+        if not frames:
+            return pd.DataFrame(columns=STANDARD_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
         
     except Exception as e:
-        print(f"Error converting to standard format: {str(e)}")
+        logger.error(f"Error converting to standard format: {str(e)}")
         # Return empty DataFrame with standard columns
-        return pd.DataFrame(columns=[
-            "transaction_id", "transaction_date", "transaction_time", 
-            "description", "dr", "cr", "balance", "source", "raw_data"
-        ])
+        return pd.DataFrame(columns=STANDARD_COLUMNS)
+
+def iter_standard_format(raw_csv: str, source: str, chunksize: int = UPLOAD_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Parse a statement in chunks of `chunksize` rows, yielding standardized frames.
+    Memory stays proportional to one chunk rather than the whole file.
+    """
+    # Find the header row
+    header_offset = _find_header_offset(raw_csv)
+    
+    if header_offset == -1:
+        logger.warning("Could not find transaction header row")
+        return
+    
+    # Parse from the header onwards; one slice instead of split + re-join
+    reader = pd.read_csv(
+        StringIO(raw_csv[header_offset:]), 
+        sep=',',
+        engine='c',
+        on_bad_lines='skip',
+        dtype=str,
+        chunksize=chunksize
+    )
+    with reader:
+        for chunk in reader:
+            standard_df = _standardize_frame(chunk, source)
+            if not standard_df.empty:
+                yield standard_df
+
+def _standardize_frame(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Filter non-transaction rows out of a parsed chunk and map it to the standard columns."""
+    # Clean data
+    df = df.dropna(how='all')
+
+    # Find columns based on source
+    patterns = _SOURCE_ROLE_PATTERNS.get(source.lower(), _GENERIC_ROLE_PATTERNS)
+    columns = _detect_columns(df.columns, patterns)
+    date_col, desc_col = columns["date"], columns["description"]
+    debit_col, credit_col = columns["debit"], columns["credit"]
+    balance_col, ref_col = columns["balance"], columns["reference"]
+
+    # A transaction needs a date column and at least one amount column
+    if not date_col or not (debit_col or credit_col) or df.empty:
+        return pd.DataFrame(columns=STANDARD_COLUMNS)
+
+    # Filter out non-transaction rows with column-wise masks instead of a row loop
 
+    # 1. Skip rows with too many NaN values (likely headers or separators)
+    keep = df.isna().sum(axis=1) <= len(df.columns) * 0.7
 
-async def standard_format_to_transactions(df: pd.DataFrame, user_id: uuid.UUID) -> List[Transaction]:
+    # 2. Skip rows without a date, or that repeat the header
+    dates = df[date_col]
+    keep &= dates.notna() & ~dates.str.lower().isin(_HEADER_VALUES)
+
+    # 3. Skip summary/metadata rows (checked in the description and in every cell)
+    description = df[desc_col].fillna('') if desc_col else pd.Series('', index=df.index)
+    keep &= ~description.str.lower().str.contains('|'.join(map(re.escape, _DESCRIPTION_SKIP_TERMS)))
+    cell_pattern = '|'.join(map(re.escape, _CELL_SKIP_TERMS))
+    for col in df.columns:
+        keep &= ~df[col].str.contains(cell_pattern, case=False, regex=True, na=False)
+
+    # 4. Skip if both debit and credit are zero or empty (informational rows)
+    zero = pd.Series(0.0, index=df.index)
+    dr = _parse_amounts(df[debit_col]) if debit_col else zero
+    cr = _parse_amounts(df[credit_col]) if credit_col else zero
+    keep &= (dr != 0.0) | (cr != 0.0)
+
+    df = df[keep]
+    if df.empty:
+        return pd.DataFrame(columns=STANDARD_COLUMNS)
+
+    # Extract transaction_date and transaction_time; unparseable dates fall back to now
+    now = datetime.now()
+    date_text = df[date_col].str.strip()
+    parsed = _parse_dates(date_text)
+    transaction_date = parsed.dt.date.where(parsed.notna(), now.date())
+    # Only datetime fields (eSewa) carry a time of day
+    has_time = parsed.notna() & date_text.str.contains(':', regex=False)
+    transaction_time = parsed.dt.time.where(has_time, now.time())
+
+    balance = _parse_amounts(df[balance_col]) if balance_col else zero
+
+    transaction_id = None
+    if ref_col:
+        transaction_id = df[ref_col].str.strip()
+        transaction_id = transaction_id.astype(object).where(transaction_id.notna(), None)
+
+    standard_df = pd.DataFrame({
+        "transaction_id": transaction_id,
+        "transaction_date": transaction_date,
+        "transaction_time": transaction_time,
+        "description": description[df.index],
+        "dr": dr[df.index],
+        "cr": cr[df.index],
+        "balance": balance[df.index],
+        "source": source,
+        # Original row, serialized in one pass. Split on "\n" only: JSON escapes newlines inside
+        # strings, but splitlines() would also break on unescaped U+2028, \x1c and the like
+        "raw_data": df.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").split("\n") if len(df) else [],
+    }, index=df.index)
+    return standard_df.reset_index(drop=True)
+
+
+async def standard_format_to_records(df: pd.DataFrame, user_id: uuid.UUID) -> List[Dict]:
     """
-    Converts standardized DataFrame to Transaction objects with categories
+    Converts standardized DataFrame to insert-ready transaction rows with categories.
+    Plain dicts are fed straight to a bulk INSERT, so no ORM objects are built.
     """
-    transactions = []
+    records = []
+    bad_row_count = 0
     
     if df.empty:
         return []
     
-    for _, row in df.iterrows():
+    rows = df.to_dict(orient="records")
+    # Categories depend only on the description; the whole chunk is categorized with
+    # concurrent (bounded) Groq calls instead of one round trip per row
+    descriptions = [str(row.get("description", "")) for row in rows]
+    categories = await detect_categories(descriptions)
+    
+    for row, description, category in zip(rows, descriptions, categories):
         try:
-            # Get the description for category detection
-            description = str(row.get("description", ""))
-            
-            # Detect category based only on the description
-            category = await detect_category_for_transaction(description)
-            
-            # Create Transaction object with category field
-            transaction = Transaction(
-                id=uuid.uuid4(),
-                user_id=user_id,
-                transaction_id=row.get("transaction_id"),
-                transaction_date=row.get("transaction_date"),
-                transaction_time=row.get("transaction_time"),
-                description=description,
-                category=category,  # Add category here
-                dr=float(row.get("dr", 0.0)),
-                cr=float(row.get("cr", 0.0)),
-                source=row.get("source", "Unknown"),
-                balance=float(row.get("balance", 0.0)),
-                raw_data=row.get("raw_data", "{}")
-            )
-            
-            transactions.append(transaction)
+            records.append({
+                "id": uuid7(),
+                "user_id": user_id,
+                "transaction_id": row.get("transaction_id"),
+                "transaction_date": row.get("transaction_date"),
+                "transaction_time": row.get("transaction_time"),
+                "description": description,
+                "category": category,
+                "dr": float(row.get("dr", 0.0)),
+                "cr": float(row.get("cr", 0.0)),
+                "source": row.get("source", "Unknown"),
+                "balance": float(row.get("balance", 0.0)),
+                "raw_data": row.get("raw_data", "{}")
+            })
             
         except Exception as e:
-            print(f"Error creating transaction: {str(e)}")
+            bad_row_count += 1
+            logger.debug("Error creating transaction: %s", e)
             continue
-            
-    return transactions
\ No newline at end of file
+    
+    if bad_row_count:
+        logger.warning(f"Dropped {bad_row_count} rows that could not be converted to transactions")
+    return records
@@ -1,12 +1,15 @@
+from sqlalchemy import delete, exists, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timezone
 from uuid import UUID
+from typing import Any, Dict, List, Optional
 import random
 import string
 from fastapi import HTTPException, status
-from app.models.user import User
+from app.models.user import UserProfile
 
-from app.models.voucher import Voucher, VoucherType
+from app.models.voucher import Voucher, VoucherType, user_vouchers
 from app.schemas.voucher import VoucherCreate, VoucherUpdate
 
 def generate_voucher_code(length=8):
@@ -23,7 +26,6 @@ def create_voucher(db: Session, voucher_data: VoucherCreate, creator_id: UUID =
         points_cost=voucher_data.points_cost,
         amount=voucher_data.amount,
         type=voucher_data.type,
-        valid_from=voucher_data.valid_from or datetime.utcnow(),
         valid_until=voucher_data.valid_until,
         is_active=voucher_data.is_active if hasattr(voucher_data, 'is_active') else True,
         usage_limit=voucher_data.usage_limit if hasattr(voucher_data, 'usage_limit') else 1,
@@ -31,6 +33,10 @@ def create_voucher(db: Session, voucher_data: VoucherCreate, creator_id: UUID =
         created_by_id=creator_id
     )
     
+    # Left unset when not provided so the server default (now()) applies
+    if voucher_data.valid_from is not None:
+        db_voucher.valid_from = voucher_data.valid_from
+    
     db.add(db_voucher)
     db.commit()
     db.refresh(db_voucher)
@@ -38,34 +44,46 @@ def create_voucher(db: Session, voucher_data: VoucherCreate, creator_id: UUID =
 # Add this function to your existing voucher_service.py
 
 def purchase_voucher(db: Session, voucher_id: UUID, user_id: UUID):
-    """Purchase a voucher with user points"""
-    # Get the user and voucher
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return {"success": False, "message": "User not found"}
-    
-    voucher = get_voucher_by_id(db, voucher_id)
-    if not voucher:
-        return {"success": False, "message": "Voucher not found"}
-    
-    # Check if voucher is valid
-    if not voucher.is_valid():
+    """
+    Purchase a voucher with user points.
+    Each step is a conditional write inside one transaction, so concurrent purchases
+    can't oversell the voucher, double-buy it, or push points below zero.
+    """
+    # Claim one use while the voucher is still valid
+    voucher = db.execute(
+        update(Voucher)
+        .where(Voucher.id == voucher_id, Voucher.is_valid)
+        .values(usage_count=Voucher.usage_count + 1)
+        .returning(Voucher)
+    ).scalar_one_or_none()
+    if voucher is None:
+        db.rollback()
+        if not db.scalar(select(exists().where(Voucher.id == voucher_id))):
+            return {"success": False, "message": "Voucher not found"}
         return {"success": False, "message": "Voucher is not available"}
     
-    # Check if user has enough points
-    if user.profile.points < voucher.points_cost:
-        return {"success": False, "message": f"Not enough points. Required: {voucher.points_cost}, Available: {user.profile.points}"}
-    
-    # Check if user already purchased this voucher
-    if voucher in user.purchased_vouchers:
+    # Record the purchase; the (user_id, voucher_id) primary key rejects a second one
+    purchased = db.execute(
+        pg_insert(user_vouchers)
+        .values(user_id=user_id, voucher_id=voucher_id)
+        .on_conflict_do_nothing()
+        .returning(user_vouchers.c.user_id)
+    ).first()
+    if purchased is None:
+        db.rollback()
         return {"success": False, "message": "You have already purchased this voucher"}
     
-    # Deduct points and add voucher to user's purchased vouchers
-    user.profile.points -= voucher.points_cost
-    user.purchased_vouchers.append(voucher)
-    
-    # Increase usage count
-    voucher.usage_count += 1
+    # Deduct points only if the balance covers the cost
+    remaining_points = db.execute(
+        update(UserProfile)
+        .where(UserProfile.user_id == user_id, UserProfile.points >= voucher.points_cost)
+        .values(points=UserProfile.points - voucher.points_cost)
+        .returning(UserProfile.points)
+    ).scalar_one_or_none()
+    if remaining_points is None:
+        db.rollback()
+        available = db.scalar(select(UserProfile.points).where(UserProfile.user_id == user_id)) or 0
+        return {"success": False, "message": f"Not enough points. Required: {voucher.points_cost}, Available: {available}"}
     
     db.commit()
     
@@ -73,7 +91,7 @@ def purchase_voucher(db: Session, voucher_id: UUID, user_id: UUID):
         "success": True, 
         "message": "Voucher purchased successfully", 
         "voucher": voucher,
-        "remaining_points": user.profile.points
+        "remaining_points": remaining_points
     }
 
 def get_vouchers(db: Session, skip: int = 0, limit: int = 100, active_only: bool = False):
@@ -81,58 +99,50 @@ def get_vouchers(db: Session, skip: int = 0, limit: int = 100, active_only: bool
     query = db.query(Voucher)
     
     if active_only:
-        now = datetime.utcnow()
-        query = query.filter(
-            Voucher.is_active == True,
-            (Voucher.valid_from == None) | (Voucher.valid_from <= now),
-            (Voucher.valid_until == None) | (Voucher.valid_until >= now),
-            (Voucher.usage_limit == None) | (Voucher.usage_count < Voucher.usage_limit)
-        )
+        # Same predicate as Voucher.is_valid, evaluated in the database (served by ix_voucher_active_current)
+        query = query.filter(Voucher.is_valid)
     
     return query.offset(skip).limit(limit).all()
 
 def get_voucher_by_id(db: Session, voucher_id: UUID):
     """Get voucher by ID"""
-    return db.query(Voucher).filter(Voucher.id == voucher_id).first()
+    return db.get(Voucher, voucher_id)
 
 def get_voucher_by_code(db: Session, code: str):
     """Get voucher by code"""
-    return db.query(Voucher).filter(Voucher.code == code).first()
+    return db.execute(lambda_stmt(lambda: select(Voucher).where(Voucher.code == code))).scalars().first()
 
 def update_voucher(db: Session, voucher_id: UUID, voucher_data: VoucherUpdate):
-    """Update an existing voucher"""
-    voucher = get_voucher_by_id(db, voucher_id)
-    if not voucher:
-        return None
-    
-    for field, value in voucher_data.dict(exclude_unset=True).items():
-        setattr(voucher, field, value)
-    
+    """Update an existing voucher with a single UPDATE ... RETURNING"""
+    values = {field: getattr(voucher_data, field) for field in voucher_data.model_fields_set}
+    if not values:
+        return get_voucher_by_id(db, voucher_id)
+    
+    voucher = db.execute(
+        update(Voucher).where(Voucher.id == voucher_id).values(**values).returning(Voucher)
+    ).scalar_one_or_none()
     db.commit()
-    db.refresh(voucher)
     return voucher
 
 def delete_voucher(db: Session, voucher_id: UUID):
-    """Delete a voucher"""
-    voucher = get_voucher_by_id(db, voucher_id)
-    if not voucher:
+    """Delete a voucher (and its purchase records) without loading it first"""
+    db.execute(delete(user_vouchers).where(user_vouchers.c.voucher_id == voucher_id))
+    result = db.execute(delete(Voucher).where(Voucher.id == voucher_id))
+    if result.rowcount == 0:
+        db.rollback()
         return False
     
-    db.delete(voucher)
     db.commit()
     return True
 
-def validate_voucher(db: Session, code: str, purchase_amount: float = 0):
-    """Validate if voucher is applicable"""
-    voucher = get_voucher_by_code(db, code)
-    
+def _check_voucher(voucher: Optional[Voucher], purchase_amount: float, now: datetime) -> Dict[str, Any]:
+    """Apply the validity rules to an already loaded voucher (None means the code was not found)"""
     if not voucher:
         return {"valid": False, "message": "Voucher not found", "voucher": None}
     
     if not voucher.is_active:
         return {"valid": False, "message": "Voucher is inactive", "voucher": voucher}
     
-    now = datetime.utcnow()
     if voucher.valid_from and now < voucher.valid_from:
         return {"valid": False, "message": "Voucher is not yet valid", "voucher": voucher}
     
@@ -163,6 +173,19 @@ def validate_voucher(db: Session, code: str, purchase_amount: float = 0):
         "discount_amount": discount
     }
 
+def validate_voucher(db: Session, code: str, purchase_amount: float = 0):
+    """Validate if voucher is applicable"""
+    voucher = get_voucher_by_code(db, code)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return _check_voucher(voucher, purchase_amount, now)
+
+def validate_vouchers(db: Session, codes: List[str], purchase_amount: float = 0) -> List[Dict[str, Any]]:
+    """Validate several voucher codes with a single query; results follow the input order"""
+    vouchers = db.query(Voucher).filter(Voucher.code.in_(set(codes))).all() if codes else []
+    by_code = {voucher.code: voucher for voucher in vouchers}
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return [_check_voucher(by_code.get(code), purchase_amount, now) for code in codes]
+
 def redeem_voucher(db: Session, code: str, purchase_amount: float = 0):
     """Validate and redeem a voucher"""
     result = validate_voucher(db, code, purchase_amount)
@@ -170,8 +193,17 @@ def redeem_voucher(db: Session, code: str, purchase_amount: float = 0):
     if not result["valid"]:
         return result
     
-    voucher = result["voucher"]
-    voucher.usage_count += 1
-    db.commit()
+    # Re-check validity in the UPDATE itself so concurrent redemptions can't exceed the usage limit
+    voucher = db.execute(
+        update(Voucher)
+        .where(Voucher.id == result["voucher"].id, Voucher.is_valid)
+        .values(usage_count=Voucher.usage_count + 1)
+        .returning(Voucher)
+    ).scalar_one_or_none()
+    if voucher is None:
+        db.rollback()
+        return {"valid": False, "message": "Voucher is no longer available", "voucher": result["voucher"]}
     
+    db.commit()
+    result["voucher"] = voucher
     return result
\ No newline at end of file
@@ -1,22 +1,47 @@
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
-from dotenv import load_dotenv
+from ..core.config import get_settings
 from ..core.logging import logger
 
-load_dotenv()
+settings = get_settings()
 
-# Get email configuration from environment variables
-EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
-EMAIL_USERNAME = os.getenv("EMAIL_USERNAME", "")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
-EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@himalai.com")
+# Email configuration comes from the shared Settings object
+EMAIL_HOST = settings.EMAIL_HOST
+EMAIL_PORT = settings.EMAIL_PORT
+EMAIL_USERNAME = settings.EMAIL_USERNAME
+EMAIL_PASSWORD = settings.EMAIL_PASSWORD
+EMAIL_FROM = settings.EMAIL_FROM
 
-async def send_verification_email(to_email: str, verification_code: str):
+# SMTP delivery retries: 1s, 2s, 4s, ... between attempts
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_DELAY = 1.0
+
+def _send_with_retry(message: MIMEMultipart) -> None:
+    """Deliver a message, retrying transient SMTP/network failures with exponential backoff."""
+    for attempt in range(1, EMAIL_MAX_ATTEMPTS + 1):
+        try:
+            with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30) as server:
+                server.starttls()
+                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+                server.send_message(message)
+            return
+        except smtplib.SMTPAuthenticationError:
+            # Bad credentials won't fix themselves
+            raise
+        except (smtplib.SMTPException, OSError) as e:
+            if attempt == EMAIL_MAX_ATTEMPTS:
+                raise
+            delay = EMAIL_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            logger.warning(f"SMTP attempt {attempt} failed ({str(e)}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+def send_verification_email(to_email: str, verification_code: str):
     """
     Send verification email with the verification code.
+    This is a plain function so BackgroundTasks runs it in the threadpool;
+    the SMTP dial/TLS/send never blocks the event loop.
     """
     # Simple implementation - for a real app, you'd want to use a service like SendGrid
     try:
@@ -43,11 +68,8 @@ async def send_verification_email(to_email: str, verification_code: str):
         
         # Connect to server and send email
         if EMAIL_USERNAME and EMAIL_PASSWORD:
-            with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-                server.starttls()
-                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-                server.send_message(message)
-                logger.info(f"Verification email sent to {to_email}")
+            _send_with_retry(message)
+            logger.info(f"Verification email sent to {to_email}")
         else:
             logger.warning("Email credentials not configured. Verification email not sent.")
             logger.debug(f"Would have sent verification code {verification_code} to {to_email}")
@@ -1,10 +1,14 @@
-import random
-import string
+import base64
+import os
+import secrets
+import time
+import uuid
 from datetime import datetime, timedelta
+from typing import Tuple
 
 def generate_verification_code(length: int = 6) -> str:
     """Generate a random verification code"""
-    return ''.join(random.choices(string.digits, k=length))
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
 
 def get_code_expiry(minutes: int = 30) -> datetime:
     """Get expiry time for verification code"""
@@ -15,4 +19,37 @@ def parse_full_name(full_name: str) -> tuple:
     parts = full_name.strip().split(' ', 1)
     first_name = parts[0]
     last_name = parts[1] if len(parts) > 1 else ""
-    return first_name, last_name
\ No newline at end of file
+    return first_name, last_name
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+    The leading 48 bits are the Unix time in milliseconds, so new rows land at
+    the right edge of the primary key index instead of at random pages.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    rand_a = rand >> 68                  # 12 bits
+    rand_b = rand & ((1 << 62) - 1)      # 62 bits
+    value = (
+        (timestamp_ms & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | rand_a << 64
+        | 0b10 << 62
+        | rand_b
+    )
+    return uuid.UUID(int=value)
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """Encode a (created_at, id) keyset position as an opaque URL-safe cursor."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e